@@ -1,8 +1,42 @@
 import streamlit as st
-import requests
+from concurrent import futures
 from datetime import datetime
 import random
+import time
+from streamlit import runtime
 from streamlit.components.v1 import html
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from factverify import (
+    VERIFY_TIMEOUT,
+    CancelToken,
+    SessionRegistry,
+    breaker_status,
+    breakers,
+    configure_cache,
+    configure_speculator,
+    Deadline,
+    get_verified_response,
+    handle_login,
+    handle_signup,
+    metrics,
+    open_session_store,
+    process_rss_bytes,
+    sign_session_cookie,
+    start_health_monitor,
+    verify_session_cookie,
+)
+from factverify.sessions import COOKIE_NAME, SESSION_TTL, new_session_id
+from factverify.render import (
+    MOTIVATIONAL_MESSAGES,
+    SOURCES_HEADING_HTML,
+    display_name_for,
+    greeting_for_hour,
+    header_html,
+    response_html,
+    source_html,
+    verdict_html,
+)
 
 # ======================
 # 1. INITIALIZATION & CONFIG
@@ -209,116 +243,180 @@ def initialize_firebase():
     }
 
 firebase_config = initialize_firebase()
-FIREBASE_SIGNUP_URL = f"https://identitytoolkit.googleapis.com/v1/accounts:signUp?key={firebase_config['apiKey']}"
-FIREBASE_LOGIN_URL = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={firebase_config['apiKey']}"
-
-def handle_signup(first_name, last_name, email, password):
-    try:
-        response = requests.post(
-            FIREBASE_SIGNUP_URL,
-            json={"email": email, "password": password, "returnSecureToken": True},
-            timeout=10
-        )
-        if response.status_code == 200:
-            # Update user profile with name
-            update_response = requests.post(
-                f"https://identitytoolkit.googleapis.com/v1/accounts:update?key={firebase_config['apiKey']}",
-                json={
-                    "idToken": response.json().get("idToken", ""),
-                    "displayName": f"{first_name} {last_name}",
-                    "returnSecureToken": True
-                },
-                timeout=10
-            )
-            return True, "Account created successfully!", {
-                "idToken": response.json().get("idToken", ""),
-                "first_name": first_name,
-                "last_name": last_name
-            }
-        error = response.json().get("error", {}).get("message", "Unknown error")
-        return False, error, None
-    except Exception as e:
-        return False, f"Connection error: {str(e)}", None
-
-def handle_login(email, password):
-    try:
-        response = requests.post(
-            FIREBASE_LOGIN_URL,
-            json={"email": email, "password": password, "returnSecureToken": True},
-            timeout=10
-        )
-        if response.status_code == 200:
-            # Get user info from Firebase
-            user_info = requests.post(
-                f"https://identitytoolkit.googleapis.com/v1/accounts:lookup?key={firebase_config['apiKey']}",
-                json={"idToken": response.json().get("idToken", "")},
-                timeout=10
-            )
-            user_data = user_info.json().get("users", [{}])[0]
-            names = user_data.get("displayName", "").split() if user_data.get("displayName") else []
-            return True, "Login successful!", {
-                "idToken": response.json().get("idToken", ""),
-                "first_name": names[0] if len(names) > 0 else "",
-                "last_name": names[-1] if len(names) > 1 else ""
-            }
-        error = response.json().get("error", {}).get("message", "Unknown error")
-        return False, error, None
-    except Exception as e:
-        return False, f"Connection error: {str(e)}", None
+if hasattr(st, 'secrets') and "cache" in st.secrets:
+    configure_cache(dict(st.secrets.cache))
+
+@st.cache_resource
+def get_health_monitor():
+    # Returns the monitor factverify.serve started with the process; under a
+    # plain `streamlit run` it starts here, on the first page load, instead.
+    # Either way the first probe runs in the background
+    config = {name: dict(st.secrets[name]) for name in ("firebase", "llama", "health") if name in st.secrets}
+    health = config.get("health", {})
+    return start_health_monitor(
+        config,
+        interval=float(health.get("interval", 30)),
+        ready_port=health.get("ready_port")
+    )
+
+health_monitor = get_health_monitor()
+
+# Shared sessions: restored from a signed cookie on any replica
+@st.cache_resource
+def get_session_store():
+    # Without a signing secret sessions stay per-process, as before
+    if not hasattr(st, 'secrets') or "session" not in st.secrets or not st.secrets.session.get("secret"):
+        return None
+    return open_session_store(dict(st.secrets.session))
+
+session_store = get_session_store()
+
+def start_shared_session(email, result):
+    """Saves the login to the shared store and queues the signed cookie"""
+    if session_store is None:
+        return
+    ttl = float(st.secrets.session.get("ttl", SESSION_TTL))
+    session_id = new_session_id()
+    # The Firebase ID token expires after an hour, so it stays with this
+    # process's session; a restored session only needs who is logged in
+    session_store.set(session_id, {
+        'email': email,
+        'first_name': result.get("first_name", ""),
+        'last_name': result.get("last_name", "")
+    }, ttl)
+    st.session_state.session_id = session_id
+    cookie = sign_session_cookie(session_id, time.time() + ttl, st.secrets.session.secret)
+    st.session_state.pending_cookie = (cookie, int(ttl))
+
+def restore_shared_session():
+    """Logs the browser back in from its session cookie, without calling Firebase"""
+    if session_store is None or st.session_state.logged_in:
+        return
+    session_id = verify_session_cookie(st.context.cookies.get(COOKIE_NAME), st.secrets.session.secret)
+    data = session_store.get(session_id) if session_id else None
+    if data:
+        st.session_state.update(data, logged_in=True, session_id=session_id)
+        metrics.incr("sessions_restored")
+
+def end_shared_session():
+    session_id = st.session_state.get('session_id')
+    if session_store is not None and session_id:
+        session_store.delete(session_id)
+
+def write_session_cookie(value, max_age):
+    # Streamlit can't set cookies server-side; the component iframe is same-origin.
+    # That also means the cookie can't be HttpOnly, so at least keep it off plain HTTP
+    html(f"""<script>
+        const secure = parent.location.protocol === "https:" ? "; Secure" : "";
+        parent.document.cookie = "{COOKIE_NAME}={value}; path=/; max-age={max_age}; SameSite=Strict" + secure;
+    </script>""", height=0)
 
 # ======================
 # 3. LLM INTEGRATION
 # ======================
-def get_verified_response(prompt):
-    """Production-ready query with academic sources using Groq API"""
-    try:
-        if not hasattr(st, 'secrets') or "llama" not in st.secrets:
-            return None, ["Missing LLM API configuration"]
-            
-        headers = {
-            "Authorization": f"Bearer {st.secrets.llama.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": "llama3-70b-8192",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": f"""You are a senior academic researcher. Provide:
-1. Accurate information current to {datetime.now().strftime('%B %Y')}
-2. 3-5 academic sources (DOIs or .edu/.gov URLs)
-3. Format: [Title](URL) - Author (Year) or DOI:..."""
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": 0.3,
-            "max_tokens": 2000,
-            "top_p": 0.9
-        }
-        
-        response = requests.post(
-            st.secrets.llama.api_url,
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            content = response.json()["choices"][0]["message"]["content"]
-            if "###SOURCES###" in content:
-                parts = content.split("###SOURCES###")
-                return parts[0].strip(), [s.strip() for s in parts[1].split("\n") if s.strip()]
-            return content, []
-        
-        error_msg = response.json().get("error", {}).get("message", "Unknown API error")
-        return None, [f"API Error: {error_msg}"]
-        
-    except Exception as e:
-        return None, [f"System Error: {str(e)}"]
+def llama_config():
+    if not hasattr(st, 'secrets') or "llama" not in st.secrets:
+        return None
+    return dict(st.secrets.llama)
+
+def show_breaker_warning(name):
+    breaker = breakers[name]
+    if breaker.state == "open":
+        st.warning(f"{breaker.label} is degraded; requests will fail fast for the next {breaker.retry_after()}s.")
+    elif breaker.state == "half_open":
+        st.info(f"{breaker.label} is recovering; the next request checks whether it is back.")
+
+@st.cache_resource
+def get_speculator():
+    if not hasattr(st, 'secrets') or "speculative" not in st.secrets:
+        return None
+    return configure_speculator(dict(st.secrets.speculative))
+
+speculator = get_speculator()
+
+def app_session(session_id):
+    # ctx.session_state is a wrapper rebuilt for every script run; the session
+    # manager holds the AppSession and its SessionState until the session is
+    # closed. It isn't public API, so without it sessions just aren't reaped or profiled
+    session_mgr = getattr(runtime.get_instance(), '_session_mgr', None) if runtime.exists() else None
+    info = session_mgr.get_session_info(session_id) if session_mgr is not None else None
+    return info.session if info is not None else None
+
+def live_session_state(session_id):
+    session = app_session(session_id)
+    return session.session_state if session is not None else None
+
+def session_script_running(session_id):
+    # The reaper deletes keys outside the run's SafeSessionState lock, so it
+    # skips sessions with a run in progress; unknown means running
+    state = getattr(app_session(session_id), '_state', None)
+    return state is None or getattr(state, 'name', None) != 'APP_NOT_RUNNING'
+
+@st.cache_resource
+def get_session_registry():
+    # Caps session state, offloads large results to the shared store and
+    # trims sessions that have been idle for too long
+    memory = dict(st.secrets.memory) if hasattr(st, 'secrets') and "memory" in st.secrets else {}
+    
+    def on_reap(session_id, state):
+        if speculator and "speculation_key" in state:
+            speculator.discard(state["speculation_key"])
+    
+    return SessionRegistry(
+        max_value_bytes=int(float(memory.get("max_value_kib", 64)) * 1024),
+        max_session_bytes=int(float(memory.get("max_session_kib", 256)) * 1024),
+        idle_seconds=float(memory.get("idle_minutes", 30)) * 60,
+        # Straight to the backend: the store's read cache would keep the value in memory
+        offload=session_store.backend if session_store is not None else None,
+        on_reap=on_reap,
+        lookup=live_session_state,
+        running=session_script_running
+    ).start_reaper()
+
+session_registry = get_session_registry()
+
+def diagnostics_enabled():
+    if not hasattr(st, 'secrets') or "memory" not in st.secrets:
+        return False
+    token = st.secrets.memory.get("diagnostics_token")
+    return bool(token) and st.query_params.get("diagnostics") == token
+
+def show_memory_diagnostics():
+    rows = session_registry.profile()
+    total = sum(row["bytes"] for row in rows)
+    rss = process_rss_bytes()
+    rss = f"{rss / 2**20:.1f} MiB" if rss is not None else "n/a"
+    st.caption(f"Process RSS {rss} · {len(rows)} sessions · {total / 1024:.1f} KiB in session state")
+    st.dataframe([{
+        "session": row["session"][:8],
+        "idle (s)": row["idle_s"],
+        "KiB": round(row["bytes"] / 1024, 1),
+        "largest key": max(row["keys"], key=row["keys"].get, default="")
+    } for row in rows], use_container_width=True, hide_index=True)
+    by_key = {}
+    for row in rows:
+        for key, size in row["keys"].items():
+            by_key[key] = by_key.get(key, 0) + size
+    st.dataframe([{"key": key, "KiB": round(size / 1024, 1)}
+                  for key, size in sorted(by_key.items(), key=lambda item: -item[1])],
+                 use_container_width=True, hide_index=True)
+
+def speculation_key():
+    if 'speculation_key' not in st.session_state:
+        st.session_state.speculation_key = new_session_id()
+    return st.session_state.speculation_key
+
+def wait_for_speculative(future, progress):
+    """Attaches to a verification started from the draft, keeping the run interruptible"""
+    while not future.done():
+        progress.caption("Finishing the verification started while you were reviewing...")
+        futures.wait([future], timeout=0.25)
+    return future.result()
+
+def cancel_verification(reason):
+    token = st.session_state.get('verify_token')
+    if token is not None:
+        token.cancel(reason)
 
 # ======================
 # 4. AUTHENTICATION UI (UPDATED)
@@ -335,6 +433,7 @@ def show_auth_ui():
             </p>
         </div>
     """, unsafe_allow_html=True)
+    show_breaker_warning("firebase")
     
     # Centered auth form with cleaner design
     with st.container():
@@ -355,7 +454,7 @@ def show_auth_ui():
                     with col1:
                         if st.form_submit_button("Login", use_container_width=True):
                             if email and password:
-                                success, message, result = handle_login(email, password)
+                                success, message, result = handle_login(email, password, firebase_config)
                                 if success:
                                     st.session_state.update({
                                         'logged_in': True,
@@ -364,6 +463,7 @@ def show_auth_ui():
                                         'first_name': result.get("first_name", ""),
                                         'last_name': result.get("last_name", "")
                                     })
+                                    start_shared_session(email, result)
                                     st.rerun()
                                 else:
                                     st.error(message)
@@ -397,7 +497,7 @@ def show_auth_ui():
                         elif password != confirm_pass:
                             st.error("Passwords don't match")
                         else:
-                            success, message, result = handle_signup(first_name, last_name, email, password)
+                            success, message, result = handle_signup(first_name, last_name, email, password, firebase_config)
                             if success:
                                 st.session_state.update({
                                     'first_name': first_name,
@@ -406,6 +506,7 @@ def show_auth_ui():
                                     'email': email,
                                     'id_token': result.get("idToken", "")
                                 })
+                                start_shared_session(email, result)
                                 st.rerun()
                             else:
                                 st.error(message)
@@ -416,48 +517,44 @@ def show_auth_ui():
 # ======================
 # 5. MAIN APP UI (UPDATED)
 # ======================
-def show_main_app():
-    first_name = st.session_state.get('first_name', '')
-    last_name = st.session_state.get('last_name', '')
-    display_name = f"{first_name[0].upper()}. {last_name}" if first_name else st.session_state.email.split('@')[0]
+def show_result(response, sources, details):
+    st.markdown(response_html(response), unsafe_allow_html=True)
+    if "verdict" in details:
+        st.markdown(verdict_html(details["verdict"], details.get("confidence")),
+                    unsafe_allow_html=True)
     
-    # Time-based greeting
-    current_hour = datetime.now().hour
-    if 5 <= current_hour < 12:
-        greeting = "Good Morning"
-    elif 12 <= current_hour < 17:
-        greeting = "Good Afternoon"
-    else:
-        greeting = "Good Evening"
+    if sources:
+        st.markdown(SOURCES_HEADING_HTML, unsafe_allow_html=True)
+        for source in sources:
+            st.markdown(source_html(source), unsafe_allow_html=True)
+        
+        st.markdown("</div>", unsafe_allow_html=True)
+
+def show_main_app():
+    display_name = display_name_for(
+        st.session_state.get('first_name', ''),
+        st.session_state.get('last_name', ''),
+        st.session_state.email
+    )
     
-    # Motivational messages
-    motivational_messages = [
-        "What fact shall we verify today?",
-        "Ready to uncover the truth?",
-        "Knowledge is power - let's find some!",
-        "Every search brings us closer to truth",
-        "Let's explore something fascinating!"
-    ]
-    random_message = random.choice(motivational_messages)
+    # Time-based greeting and motivational message
+    greeting = greeting_for_hour(datetime.now().hour)
+    random_message = random.choice(MOTIVATIONAL_MESSAGES)
     
     # Header with greeting
     with st.container():
         col1, col2 = st.columns([5, 1])
         with col1:
-            st.markdown(f"""
-                <div style="display: flex; align-items: center; gap: 1rem; margin-bottom: 2rem;">
-                    <div class="user-avatar">
-                        {display_name[0].upper()}
-                    </div>
-                    <div>
-                        <h1 style="margin: 0; color: var(--text); font-size: 1.8rem;">{greeting}, {display_name}</h1>
-                        <p style="margin: 0; color: var(--text-secondary); font-size: 1.1rem;">{random_message}</p>
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
+            st.markdown(header_html(display_name, greeting, random_message), unsafe_allow_html=True)
         with col2:
             if st.button("Logout", use_container_width=True, key="logout_btn"):
+                cancel_verification("logout")
+                if speculator:
+                    speculator.discard(speculation_key())
+                end_shared_session()
                 st.session_state.clear()
+                if session_store is not None:
+                    st.session_state.pending_cookie = ("", 0)
                 st.rerun()
     
     # Feedback section in sidebar - Now with reliable link
@@ -482,9 +579,25 @@ def show_main_app():
                 Share Your Feedback
             </a>
         """, unsafe_allow_html=True)
+        
+        with st.expander("Service metrics"):
+            st.caption("Ready" if health_monitor.ready() else "Not ready")
+            st.json({
+                "upstreams": health_monitor.status(),
+                "breakers": breaker_status(),
+                "speculative": speculator.status() if speculator else None,
+                "counters": metrics.snapshot()
+            })
+        
+        if diagnostics_enabled():
+            with st.expander("Session memory"):
+                show_memory_diagnostics()
+    
+    show_breaker_warning("llama")
     
-    # Enhanced query form
-    with st.form(key="query_form"):
+    # Enhanced query form (a plain container in speculative mode, so the
+    # draft reaches the server before the button is pressed)
+    with st.container() if speculator else st.form(key="query_form"):
         st.markdown("<h2 style='color: var(--text); margin-bottom: 1rem;'>Research Query</h2>", unsafe_allow_html=True)
         st.markdown("<p style='color: var(--text-secondary); margin-bottom: 1.5rem;'>Enter your question or statement to verify with academic sources</p>", unsafe_allow_html=True)
         
@@ -496,47 +609,87 @@ def show_main_app():
             label_visibility="collapsed"
         )
         
-        submitted = st.form_submit_button("Verify Information", 
-                                        use_container_width=True,
-                                        type="primary")
+        if speculator:
+            submitted = st.button("Verify Information",
+                                  use_container_width=True,
+                                  type="primary",
+                                  key="verify_btn")
+            if prompt and not submitted:
+                speculator.schedule(speculation_key(), prompt, llama_config())
+        else:
+            submitted = st.form_submit_button("Verify Information", 
+                                            use_container_width=True,
+                                            type="primary")
         
         if submitted:
             if not prompt:
                 st.warning("Please enter a question")
             else:
+                # A resubmit supersedes whatever this session still has in flight
+                cancel_verification("superseded")
+                token = CancelToken()
+                st.session_state.verify_token = token
+                progress = st.empty()
+                last_update = [0.0]
+                
+                def show_progress(count):
+                    # Each st call is a checkpoint where Streamlit interrupts a
+                    # run that has been superseded by a rerun
+                    now = time.monotonic()
+                    if now - last_update[0] >= 0.25:
+                        last_update[0] = now
+                        # Structured answers arrive in one piece, so they report 0 until done
+                        progress.caption(f"Received {count} tokens..." if count else "Waiting for the answer...")
+                
+                details = {}
+                response = None
                 with st.spinner("🔍 Verifying with academic databases..."):
-                    response, sources = get_verified_response(prompt)
+                    claimed = speculator.claim(speculation_key(), prompt) if speculator else None
+                    if claimed:
+                        future, st.session_state.verify_token = claimed
+                        response, sources, details = wait_for_speculative(future, progress)
+                    if not response:
+                        response, sources = get_verified_response(
+                            prompt,
+                            llama_config(),
+                            deadline=Deadline(VERIFY_TIMEOUT),
+                            cancel_token=token,
+                            on_progress=show_progress,
+                            meta=details
+                        )
+                    progress.empty()
+                    
+                    st.session_state.pop('verify_token', None)
                     
                     if response:
-                        st.markdown(f"""
-                            <div class="response-card">
-                                <p style="color: var(--text); font-size: 1.1rem; line-height: 1.6;">{response}</p>
-                            </div>
-                        """, unsafe_allow_html=True)
-                        
-                        if sources:
-                            st.markdown("""
-                                <div style="margin-top: 2rem;">
-                                    <h3 style="color: var(--text-secondary); margin-bottom: 1rem;">
-                                        📚 Verified Sources:
-                                    </h3>
-                            """, unsafe_allow_html=True)
-                            
-                            for source in sources:
-                                st.markdown(f"""
-                                    <div class="source-item">
-                                        <p style="margin: 0; color: var(--text); font-size: 1rem;">{source}</p>
-                                    </div>
-                                """, unsafe_allow_html=True)
-                            
-                            st.markdown("</div>", unsafe_allow_html=True)
+                        # Kept so the answer survives reruns; large ones move to the shared store
+                        st.session_state.last_result = {
+                            'response': response,
+                            'sources': sources,
+                            'details': {k: details[k] for k in ("verdict", "confidence") if k in details}
+                        }
+                        ctx = get_script_run_ctx()
+                        if ctx is not None:
+                            session_registry.enforce(ctx.session_id, st.session_state, evictable=('last_result',))
+                        show_result(response, sources, details)
                     else:
                         st.error("Failed to get verified response. Please check:")
                         st.error("\n".join(sources) if sources else "Unknown error occurred")
+        elif 'last_result' in st.session_state:
+            last_result = session_registry.load(st.session_state, 'last_result')
+            if last_result:
+                show_result(last_result['response'], last_result['sources'], last_result['details'])
 
 # ======================
 # 6. APP ROUTING
 # ======================
+ctx = get_script_run_ctx()
+if ctx is not None:
+    session_registry.touch(ctx.session_id)
+restore_shared_session()
+if 'pending_cookie' in st.session_state:
+    write_session_cookie(*st.session_state.pop('pending_cookie'))
+
 if not st.session_state.logged_in:
     show_auth_ui()
 else:
@@ -0,0 +1,222 @@
+"""Hot-path microbenchmarks replayed from recorded upstream fixtures
+
+    python benchmarks/bench_hotpaths.py                 # compare with budgets.json
+    python benchmarks/bench_hotpaths.py --update-budgets
+    python benchmarks/bench_hotpaths.py --record        # re-record fixtures
+
+Each case is measured in the calling thread: the fastest CPU time over
+--iterations runs (the least noisy estimate on a shared machine), then one
+traced run for the peak of memory allocated during the call, the number of
+blocks the call allocated that were still live when it returned, and what
+stayed allocated after a collection. CPU time is budgeted as cpu_x, a
+multiple of a fixed calibration workload timed the same way in the same
+process, so budgets carry over between machines. The run fails when a case
+exceeds its budget's cpu_x, allocs or peak_kib. With fewer --iterations than
+the default the CPU minimum is too noisy to gate on, so a cpu_x overrun only
+warns.
+
+Re-recording talks to the real upstreams. It needs the usual
+FACTVERIFY_FIREBASE_*/FACTVERIFY_LLAMA_* settings (or --config), plus
+FACTVERIFY_BENCH_EMAIL and FACTVERIFY_BENCH_PASSWORD for an existing test
+account. Signup creates a throwaway bench+<random>@ alias of that address.
+"""
+import argparse
+import gc
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+import uuid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+from factverify import handle_login, handle_signup, get_verified_response, load_config  # noqa: E402
+from factverify.render import SOURCES_HEADING_HTML, header_html, response_html, source_html  # noqa: E402
+from replay import RecordingAdapter, ReplayAdapter, load_fixture, mount, save_fixture  # noqa: E402
+
+FIXTURES = os.path.join(HERE, "fixtures")
+BUDGETS = os.path.join(HERE, "budgets.json")
+CLAIM = "Is climate change caused by humans?"
+ITERATIONS = 200
+HEADROOM = 2.0
+# Absolute slack so microsecond-scale cases don't fail on timer noise
+MIN_SLACK = {"cpu_x": 1.0, "allocs": 50, "peak_kib": 4}
+BUDGETED = tuple(MIN_SLACK)
+CALIBRATION_PAYLOAD = {"choices": [{"delta": {"content": f"token {i} of the answer"}} for i in range(40)]}
+# Keeps the baseline snapshot's own objects out of the allocation count
+NOT_TRACEMALLOC = tracemalloc.Filter(False, tracemalloc.__file__)
+
+
+def replay_config(fixture):
+    return {
+        "firebase": {"apiKey": "replay"},
+        "llama": {"api_key": "replay", "api_url": fixture["verify"][0]["request"]["url"]},
+    }
+
+
+def cases(config, email="bench@example.com", password="bench-password"):
+    """{name: (fixture name or None, zero-argument callable)}"""
+    firebase = config.get("firebase")
+    llama = config.get("llama")
+    answer, sources = "", []
+
+    def verify():
+        nonlocal answer, sources
+        answer, sources = get_verified_response(CLAIM, llama, use_cache=False, structured=False)
+        assert answer, sources
+
+    def verify_structured():
+        meta = {}
+        response, errors = get_verified_response(CLAIM, llama, use_cache=False, structured=True, meta=meta)
+        assert response and meta["mode"] == "structured", (errors, meta)
+
+    def render():
+        parts = [header_html("B. User", "Good Morning", "Ready to uncover the truth?"), response_html(answer)]
+        parts.append(SOURCES_HEADING_HTML)
+        parts.extend(source_html(source) for source in sources)
+        return "".join(parts)
+
+    def signup():
+        local, _, domain = email.partition("@")
+        ok, message, _ = handle_signup("Bench", "User", f"{local}+{uuid.uuid4().hex[:8]}@{domain}", password, firebase)
+        assert ok, message
+
+    def login():
+        ok, message, _ = handle_login(email, password, firebase)
+        assert ok, message
+
+    return {
+        "handle_login": ("login", login),
+        "handle_signup": ("signup", signup),
+        "get_verified_response": ("verify", verify),
+        "get_verified_response_structured": ("verify_structured", verify_structured),
+        "render_main_app": (None, render),
+    }
+
+
+def calibration_workload():
+    """JSON, regex and string work in the proportions of the hot paths; about 100 us on a laptop"""
+    text = json.dumps(CALIBRATION_PAYLOAD)
+    json.loads(text)
+    re.findall(r"[a-z]+", text)
+    return "".join(f"<p>{i}</p>" for i in range(100))
+
+
+def min_cpu_seconds(fn, iterations):
+    fn()  # warm caches and imports
+    gc.collect()
+    samples = []
+    for _ in range(iterations):
+        start = time.thread_time()
+        fn()
+        samples.append(time.thread_time() - start)
+    return min(samples)
+
+
+def measure(fn, iterations, calibration):
+    cpu = min_cpu_seconds(fn, iterations)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot().filter_traces([NOT_TRACEMALLOC])
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    after = tracemalloc.take_snapshot().filter_traces([NOT_TRACEMALLOC])
+    allocs = sum(max(stat.count_diff, 0) for stat in after.compare_to(before, "lineno"))
+    del before, after
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {
+        "cpu_us": round(cpu * 1e6, 1),
+        "cpu_x": round(cpu / calibration, 2),
+        "allocs": allocs,
+        "peak_kib": round((peak - baseline) / 1024, 1),
+        "retained_kib": round((current - baseline) / 1024, 1),
+    }
+
+
+def record(config_path):
+    config = load_config(config_path)
+    email = os.environ.get("FACTVERIFY_BENCH_EMAIL")
+    password = os.environ.get("FACTVERIFY_BENCH_PASSWORD")
+    if not (email and password and config.get("firebase") and config.get("llama")):
+        sys.exit("recording needs firebase and llama config plus FACTVERIFY_BENCH_EMAIL/_PASSWORD")
+    config["firebase"] = {"apiKey": config["firebase"]["api_key"]}
+    for name, (fixture, fn) in cases(config, email, password).items():
+        if fixture is None:
+            continue
+        adapter = RecordingAdapter()
+        unmount = mount(adapter)
+        try:
+            fn()
+        finally:
+            unmount()
+        save_fixture(os.path.join(FIXTURES, f"{fixture}.json"), adapter.interactions)
+        print(f"recorded {len(adapter.interactions)} interaction(s) for {name}")
+
+
+def run(iterations, update_budgets):
+    fixtures = {name[:-5]: load_fixture(os.path.join(FIXTURES, name))
+                for name in os.listdir(FIXTURES) if name.endswith(".json")}
+    budgets = {}
+    if os.path.exists(BUDGETS):
+        with open(BUDGETS, encoding="utf-8") as f:
+            budgets = json.load(f)
+
+    calibration = min_cpu_seconds(calibration_workload, max(iterations, ITERATIONS))
+    print(f"calibration workload: {calibration * 1e6:.1f} us = 1 cpu_x")
+    results, failures, warnings = {}, [], []
+    print(f"{'case':<34} {'cpu us':>9} {'cpu x':>7} {'allocs':>7} {'peak KiB':>9} {'kept KiB':>9}   budget")
+    for name, (fixture, fn) in cases(replay_config(fixtures)).items():
+        unmount = mount(ReplayAdapter(fixtures[fixture])) if fixture else (lambda: None)
+        try:
+            result = results[name] = measure(fn, iterations, calibration)
+        finally:
+            unmount()
+        budget = budgets.get(name, {})
+        over = [key for key in BUDGETED if key in budget and result[key] > budget[key]]
+        for key in over:
+            noisy = key == "cpu_x" and iterations < ITERATIONS
+            (warnings if noisy else failures).append(f"{name}: {key} {result[key]} > {budget[key]}")
+        verdict = "OVER " + ",".join(over) if over else ("ok" if budget else "no budget")
+        print(f"{name:<34} {result['cpu_us']:>9} {result['cpu_x']:>7} {result['allocs']:>7} "
+              f"{result['peak_kib']:>9} {result['retained_kib']:>9}   {verdict}")
+
+    if update_budgets:
+        budgets = {name: {key: round(max(result[key] * HEADROOM, result[key] + slack), 1)
+                          for key, slack in MIN_SLACK.items()}
+                   for name, result in results.items()}
+        with open(BUDGETS, "w", encoding="utf-8") as f:
+            json.dump(budgets, f, indent=2)
+            f.write("\n")
+        print(f"wrote {BUDGETS}")
+        return 0
+    for warning in warnings:
+        print(f"warning: {warning} (only {iterations} iterations; rerun with {ITERATIONS}+ to gate on CPU)",
+              file=sys.stderr)
+    for failure in failures:
+        print(f"budget exceeded: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--update-budgets", action="store_true", help=f"store measurements x{HEADROOM} as budgets")
+    parser.add_argument("--record", action="store_true", help="re-record fixtures from the real upstreams")
+    parser.add_argument("--config", help="TOML config used when recording")
+    args = parser.parse_args()
+    if args.record:
+        record(args.config)
+        return 0
+    return run(args.iterations, args.update_budgets)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
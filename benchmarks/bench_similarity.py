@@ -0,0 +1,117 @@
+"""Precision/recall vs. latency of the near-duplicate prompt cache
+
+    python benchmarks/bench_similarity.py --entries 1000000
+
+Precision and recall are measured on the labelled pairs below, one pair
+stored and the other looked up. Latency is measured with the index padded to
+--entries synthetic prompts.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from factverify.cache import PromptCache  # noqa: E402
+
+# (stored prompt, lookup prompt, should hit)
+PAIRS = [
+    ("Is climate change caused by humans?", "Are humans causing climate change?", True),
+    ("Does coffee cause cancer?", "Can coffee cause cancer?", True),
+    ("Is the Great Wall of China visible from space?", "Can you see the Great Wall of China from space?", True),
+    ("Do vaccines cause autism?", "Is autism caused by vaccines?", True),
+    ("Did humans land on the moon in 1969?", "Did humans really land on the moon in 1969?", True),
+    ("Is red wine good for your heart?", "Is red wine good for the heart?", True),
+    ("Does sugar make children hyperactive?", "Does sugar make kids hyperactive?", True),
+    ("Do we only use 10% of our brains?", "Do humans only use 10% of their brains?", True),
+    ("Is Pluto still a planet?", "Is Pluto a planet?", True),
+    ("Does cracking your knuckles cause arthritis?", "Can cracking knuckles cause arthritis?", True),
+    ("What is the boiling point of water at sea level?", "At sea level, what is the boiling point of water?", True),
+    ("Is the Earth flat?", "Is the Earth round?", False),
+    ("Is coffee safe during pregnancy?", "Isn't coffee safe during pregnancy?", False),
+    ("Does coffee cause cancer?", "Does smoking cause cancer?", False),
+    ("Is climate change caused by humans?", "Is climate change caused by the sun?", False),
+    ("Did humans land on the moon in 1969?", "Did humans land on Mars in 1969?", False),
+    ("What is the population of France?", "What is the population of Germany?", False),
+    ("Is red wine good for your heart?", "Is red wine bad for your liver?", False),
+    ("Do vaccines cause autism?", "Do vaccines cause allergies?", False),
+    ("Who invented the telephone?", "Who invented the television?", False),
+    ("When did World War II end?", "When did World War I end?", False),
+    ("Is the Amazon the longest river in the world?", "Is the Nile the longest river in the world?", False),
+    # Same words, different roles
+    ("Did Iraq invade Kuwait?", "Did Kuwait invade Iraq?", False),
+    ("Do dogs eat cats?", "Do cats eat dogs?", False),
+    ("Did Napoleon defeat Wellington at Waterloo?", "Did Wellington defeat Napoleon at Waterloo?", False),
+    ("Was Kuwait invaded by Iraq?", "Did Kuwait invade Iraq?", False),
+    ("Was Kuwait invaded by Iraq?", "Did Iraq invade Kuwait?", True),
+    # Numbers and numerals must agree
+    ("Was Henry VIII married six times?", "Was Henry VII married six times?", False),
+    ("Did the Western Roman Empire fall in 476?", "Did the Western Roman Empire fall in 1453?", False),
+    ("When did World War II end?", "When did World War 2 end?", True),
+]
+
+VOCABULARY_SIZE = 20_000
+
+
+def synthetic_corpus(rng, size):
+    """Prompts of 3-7 content words drawn from a Zipf-distributed vocabulary"""
+    vocabulary = [f"w{i}x" for i in range(VOCABULARY_SIZE)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+    for _ in range(size):
+        yield " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(3, 7)))
+
+
+def accuracy(threshold):
+    tp = fp = fn = 0
+    for stored, lookup, should_hit in PAIRS:
+        cache = PromptCache(similarity=threshold)
+        cache.put(stored, stored)
+        hit = cache.get(lookup) is not None
+        tp += hit and should_hit
+        fp += hit and not should_hit
+        fn += should_hit and not hit
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    return precision, recall
+
+
+def lookup_latency(cache, prompts, repeat):
+    samples = []
+    for prompt in prompts * repeat:
+        start = time.perf_counter()
+        cache.get(prompt)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--thresholds", default="0.5,0.6,0.7,0.8,0.9,1.0")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    cache = PromptCache(max_entries=args.entries + len(PAIRS))
+    start = time.perf_counter()
+    for prompt in synthetic_corpus(rng, args.entries):
+        cache.put(prompt, None)
+    for stored, _, _ in PAIRS:
+        cache.put(stored, stored)
+    print(f"indexed {len(cache):,} prompts in {time.perf_counter() - start:.1f}s")
+
+    lookups = [lookup for _, lookup, _ in PAIRS]
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'p50 us':>8} {'p99 us':>8}")
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        precision, recall = accuracy(threshold)
+        cache.similarity = threshold
+        p50, p99 = lookup_latency(cache, lookups, repeat=50)
+        print(f"{threshold:>9.2f} {precision:>9.2f} {recall:>7.2f} {p50:>8.1f} {p99:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Record and replay upstream HTTP traffic at the requests transport layer
+
+Both adapters mount on factverify.upstreams.session, so the code under test
+runs unchanged and only the socket I/O is swapped out. Fixtures are JSON:
+
+    {"interactions": [{"request": {"method": "POST", "url": "..."},
+                       "response": {"status": 200, "headers": {...}, "body": "..."}}]}
+
+Query strings (API keys) are dropped from recorded URLs, request headers are
+not stored, and token fields in response bodies are redacted.
+"""
+import io
+import json
+import re
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+from factverify.upstreams import session
+
+REDACTED_FIELDS = ("idToken", "refreshToken")
+_REDACT = re.compile(r'("(?:%s)"\s*:\s*)"[^"]*"' % "|".join(REDACTED_FIELDS))
+
+
+def _strip_query(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Answers requests from recorded interactions, cycling through them in order"""
+    def __init__(self, interactions):
+        super().__init__()
+        self.interactions = interactions
+        self._next = {}
+
+    def send(self, request, **kwargs):
+        key = (request.method, _strip_query(request.url))
+        matches = [i for i in self.interactions
+                   if (i["request"]["method"], i["request"]["url"]) == key]
+        if not matches:
+            raise LookupError(f"no recorded interaction for {key[0]} {key[1]}")
+        index = self._next.get(key, 0)
+        self._next[key] = index + 1
+        recorded = matches[index % len(matches)]["response"]
+        raw = HTTPResponse(
+            body=io.BytesIO(recorded["body"].encode()),
+            headers=recorded.get("headers", {}),
+            status=recorded["status"],
+            preload_content=False,
+        )
+        return self.build_response(request, raw)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Forwards requests to the network and keeps a redacted copy of each exchange"""
+    def __init__(self):
+        super().__init__()
+        self.interactions = []
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        body = response.content.decode(response.encoding or "utf-8")
+        self.interactions.append({
+            "request": {"method": request.method, "url": _strip_query(request.url)},
+            "response": {
+                "status": response.status_code,
+                "headers": {"Content-Type": response.headers.get("Content-Type", "")},
+                "body": _REDACT.sub(r'\1"REDACTED"', body),
+            },
+        })
+        return response
+
+
+def load_fixture(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["interactions"]
+
+
+def save_fixture(path, interactions):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"interactions": interactions}, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def mount(adapter):
+    """Routes all session traffic through adapter; returns a function that undoes it"""
+    previous = dict(session.adapters)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    def unmount():
+        session.adapters.clear()
+        session.adapters.update(previous)
+    return unmount
@@ -0,0 +1,18 @@
+"""UI-free core of FactVerify Ai, shared by the Streamlit app and the CLI"""
+from .auth import handle_login, handle_signup
+from .breaker import CircuitBreaker, CircuitOpenError, breaker_status, breakers
+from .cache import PromptCache, configure_cache, response_cache
+from .config import load_config
+from .metrics import Metrics, metrics
+from .session_memory import SessionRegistry, deep_sizeof, process_rss_bytes
+from .sessions import open_session_store, sign_session_cookie, verify_session_cookie
+from .speculative import Speculator, configure_speculator
+from .upstreams import HealthMonitor, session, start_health_monitor, upstream_origins
+from .verify import (
+    MAX_COMPLETION_TOKENS,
+    VERIFY_TIMEOUT,
+    CancelToken,
+    Deadline,
+    VerificationCancelled,
+    get_verified_response,
+)
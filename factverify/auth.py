@@ -0,0 +1,81 @@
+"""Firebase email/password authentication over the Identity Toolkit REST API"""
+import time
+
+from .breaker import CircuitOpenError, breakers, is_upstream_failure
+from .upstreams import session
+
+IDENTITY_TOOLKIT_URL = "https://identitytoolkit.googleapis.com/v1/accounts"
+
+
+def _post(url, **kwargs):
+    """POSTs through the Firebase circuit breaker"""
+    breaker = breakers["firebase"]
+    ticket = breaker.acquire()
+    started = time.monotonic()
+    try:
+        response = session.post(url, **kwargs)
+    except Exception:
+        breaker.record(ticket, False)
+        raise
+    breaker.record(ticket, not is_upstream_failure(response.status_code), time.monotonic() - started)
+    return response
+
+
+def handle_signup(first_name, last_name, email, password, firebase_config):
+    try:
+        response = _post(
+            f"{IDENTITY_TOOLKIT_URL}:signUp?key={firebase_config['apiKey']}",
+            json={"email": email, "password": password, "returnSecureToken": True},
+            timeout=10
+        )
+        if response.status_code == 200:
+            # Update user profile with name
+            update_response = _post(
+                f"{IDENTITY_TOOLKIT_URL}:update?key={firebase_config['apiKey']}",
+                json={
+                    "idToken": response.json().get("idToken", ""),
+                    "displayName": f"{first_name} {last_name}",
+                    "returnSecureToken": True
+                },
+                timeout=10
+            )
+            return True, "Account created successfully!", {
+                "idToken": response.json().get("idToken", ""),
+                "first_name": first_name,
+                "last_name": last_name
+            }
+        error = response.json().get("error", {}).get("message", "Unknown error")
+        return False, error, None
+    except CircuitOpenError as e:
+        return False, str(e), None
+    except Exception as e:
+        return False, f"Connection error: {str(e)}", None
+
+
+def handle_login(email, password, firebase_config):
+    try:
+        response = _post(
+            f"{IDENTITY_TOOLKIT_URL}:signInWithPassword?key={firebase_config['apiKey']}",
+            json={"email": email, "password": password, "returnSecureToken": True},
+            timeout=10
+        )
+        if response.status_code == 200:
+            # Get user info from Firebase
+            user_info = _post(
+                f"{IDENTITY_TOOLKIT_URL}:lookup?key={firebase_config['apiKey']}",
+                json={"idToken": response.json().get("idToken", "")},
+                timeout=10
+            )
+            user_data = user_info.json().get("users", [{}])[0]
+            names = user_data.get("displayName", "").split() if user_data.get("displayName") else []
+            return True, "Login successful!", {
+                "idToken": response.json().get("idToken", ""),
+                "first_name": names[0] if len(names) > 0 else "",
+                "last_name": names[-1] if len(names) > 1 else ""
+            }
+        error = response.json().get("error", {}).get("message", "Unknown error")
+        return False, error, None
+    except CircuitOpenError as e:
+        return False, str(e), None
+    except Exception as e:
+        return False, f"Connection error: {str(e)}", None
@@ -0,0 +1,142 @@
+"""Per-upstream circuit breakers
+
+A breaker watches the last WINDOW calls to one upstream. A call counts as
+bad if it raised, returned 429/5xx, or took longer than the breaker's
+slow-call threshold. Once at least MIN_CALLS were seen and the bad share
+reaches FAILURE_RATE, the breaker opens and calls fail fast with
+CircuitOpenError for OPEN_SECONDS. After that it half-opens: one probe call
+is let through, which closes the breaker on success or re-opens it on failure.
+
+acquire() hands out a ticket naming the breaker generation the call started
+in and whether it is the probe; record() takes it back. Every trip starts a
+new generation, so calls that were in flight when the breaker opened are
+ignored when they finish, and only the probe decides the half-open state.
+"""
+from collections import deque
+import threading
+import time
+
+from .metrics import metrics
+
+WINDOW = 20
+MIN_CALLS = 4
+FAILURE_RATE = 0.5
+OPEN_SECONDS = 30
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def is_upstream_failure(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+class CircuitBreaker:
+    def __init__(self, name, label, slow_call_seconds, open_seconds=OPEN_SECONDS):
+        self.name = name
+        self.label = label
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=WINDOW)  # True for a bad call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._generation = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def retry_after(self):
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0
+            return max(0, round(self._opened_at + self.open_seconds - time.monotonic()))
+
+    def acquire(self):
+        """Returns a ticket for record(), or raises CircuitOpenError unless a call may go out now"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return (self._generation, False)
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return (self._generation, True)
+            retry = max(1, round(self._opened_at + self.open_seconds - time.monotonic()))
+        metrics.incr(f"breaker_{self.name}_rejected")
+        raise CircuitOpenError(f"{self.label} is temporarily unavailable. Please try again in {retry}s.")
+
+    def record(self, ticket, ok, elapsed=0.0, slow_call_seconds=None):
+        """slow_call_seconds overrides the breaker's threshold for calls that are slower by design"""
+        generation, probe = ticket
+        if slow_call_seconds is None:
+            slow_call_seconds = self.slow_call_seconds
+        bad = not ok or elapsed > slow_call_seconds
+        with self._lock:
+            if generation != self._generation:
+                # Started before the last trip, which already accounted for it
+                metrics.incr(f"breaker_{self.name}_stale")
+                return
+            if self._current_state() == HALF_OPEN:
+                if not probe:
+                    return
+                self._probing = False
+                if bad:
+                    self._trip()
+                else:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    metrics.incr(f"breaker_{self.name}_closed")
+                return
+            self._calls.append(bad)
+            if len(self._calls) >= MIN_CALLS and sum(self._calls) / len(self._calls) >= FAILURE_RATE:
+                self._trip()
+
+    def release(self, ticket):
+        """Gives back a half-open probe slot whose call was cancelled before it completed"""
+        generation, probe = ticket
+        with self._lock:
+            if probe and generation == self._generation:
+                self._probing = False
+
+    def status(self):
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "recent_calls": len(self._calls),
+                "recent_failures": sum(self._calls),
+            }
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def _trip(self):
+        if self._state != OPEN:
+            metrics.incr(f"breaker_{self.name}_opened")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self._generation += 1
+
+
+breakers = {
+    "firebase": CircuitBreaker("firebase", "Authentication service", slow_call_seconds=5),
+    # Latency is time to first byte, so long answers don't count as slow; a
+    # non-streamed structured answer only starts once it is fully generated,
+    # so verify records those against STRUCTURED_SLOW_SECONDS instead
+    "llama": CircuitBreaker("llama", "Verification service", slow_call_seconds=20),
+}
+
+
+def breaker_status():
+    return {name: breaker.status() for name, breaker in breakers.items()}
@@ -0,0 +1,209 @@
+"""Response cache that also serves near-duplicate (paraphrased) prompts
+
+Prompts are reduced to their stemmed content words in order, so inflection
+and filler words don't matter, but who does what to whom does. A passive
+"X caused by Y" is read as "Y caused X": "Is climate change caused by
+humans?" and "Are humans causing climate change?" both become
+(human, caus, climat, chang) and share one entry, while "Did Kuwait invade
+Iraq?" never answers "Did Iraq invade Kuwait?".
+
+Paraphrases that differ by a word or two are served when the Jaccard
+similarity of the word sets reaches the threshold and no two shared words
+appear in swapped order. Negations and numbers (Roman numerals after a
+content word count, so "World War II" is "world war 2") must agree exactly,
+so "is X safe" never matches "is X not safe" and "World War I" never
+matches "World War II".
+
+Near-duplicate lookup is exact, not approximate: if J(q, x) >= t then x
+shares at least ceil(t * |q|) words with q, so x must contain one of the
+|q| - ceil(t * |q|) + 1 rarest words of q (prefix filter), and
+t * |q| <= |x| <= |q| / t (length filter). Postings are keyed by
+(word, entry size), so a lookup only touches entries that pass both filters.
+"""
+from collections import Counter, OrderedDict
+import math
+import re
+import threading
+import time
+
+STOPWORDS = frozenset("""
+a about actually also am an and any are as at be been being by can could did
+do does doing for from had has have having how i if in into is it its it's me
+my of on or our please really should so tell than that the their them then
+there these they this those to true was we were what when where whether which
+who why will with would you your
+""".split())
+NEGATIONS = frozenset(("not", "no", "never", "nor", "none", "cannot"))
+_ROMAN = re.compile(r"M{0,3}(CM|CD|D?C{0,3})(XC|XL|L?X{0,3})(IX|IV|V?I{0,3})")
+_ROMAN_VALUES = {"M": 1000, "D": 500, "C": 100, "L": 50, "X": 10, "V": 5, "I": 1}
+_SUFFIXES = ("ational", "ization", "ations", "ation", "ings", "ing", "edly", "ed", "ies", "es", "s")
+
+
+def _stem(word):
+    if word in NEGATIONS:
+        return word
+    if len(word) > 4:
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)] + ("y" if suffix == "ies" else "")
+                break
+    return word[:-1] if len(word) > 3 and word.endswith("e") else word
+
+
+def _roman_value(word, previous):
+    """Value of an upper-case Roman numeral following a content word ("War II", not "can I")"""
+    if previous is None or previous in STOPWORDS or not word.isupper() or not _ROMAN.fullmatch(word):
+        return None
+    values = [_ROMAN_VALUES[c] for c in word]
+    return sum(-v if v < next_v else v for v, next_v in zip(values, values[1:] + [0]))
+
+
+def _active_voice(words):
+    # "<X> <participle> by <Y>" -> "<Y> <participle> <X>"
+    for i in range(1, len(words) - 1):
+        if words[i] == "by" and words[i - 1].endswith(("ed", "en")) and words[i - 1] not in STOPWORDS:
+            return words[i + 1:] + [words[i - 1]] + words[:i - 1]
+    return words
+
+
+def prompt_sequence(prompt):
+    """Stemmed content words of a prompt, in (active-voice) order"""
+    words = []
+    for word in re.findall(r"[A-Za-z0-9]+", prompt.replace("n't", " not")):
+        value = _roman_value(word, words[-1] if words else None)
+        words.append(str(value) if value else word.lower())
+    return tuple(_stem(w) for w in _active_voice(words) if w not in STOPWORDS)
+
+
+def prompt_terms(prompt):
+    """Stemmed content words of a prompt"""
+    return frozenset(prompt_sequence(prompt))
+
+
+def _guarded(terms):
+    # Words that flip or pin down the claim; a near match must agree on all of them
+    return {t for t in terms if t in NEGATIONS or any(c.isdigit() for c in t)}
+
+
+def _swapped(sequence, other, shared):
+    """True if two shared words come in one order in sequence and the other in other"""
+    first = [t for t in sequence if t in shared]
+    second = [t for t in other if t in shared]
+    pairs = set(zip(first, first[1:]))
+    return any((b, a) in pairs for a, b in zip(second, second[1:]) if a != b)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class PromptCache:
+    """Thread-safe LRU of prompt -> value with exact and near-duplicate lookup"""
+    def __init__(self, max_entries=100_000, similarity=0.8, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (word sequence, word set, guarded words, stored at, value)
+        self._postings = {}  # (term, entry size) -> set of entry keys
+        self._df = Counter()  # term -> number of entries containing it
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, prompt):
+        """Returns (value, similarity) for the best match, or None"""
+        sequence = prompt_sequence(prompt)
+        if not sequence:
+            return None
+        key = " ".join(sequence)
+        with self._lock:
+            if key in self._entries:
+                best, best_score = key, 1.0
+            elif self.similarity >= 1:
+                return None
+            else:
+                best, best_score = self._nearest(sequence)
+                if best is None:
+                    return None
+            *_, stored_at, value = self._entries[best]
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                self._remove(best)
+                return None
+            self._entries.move_to_end(best)
+            return value, best_score
+
+    def put(self, prompt, value):
+        sequence = prompt_sequence(prompt)
+        if not sequence:
+            return
+        key = " ".join(sequence)
+        terms = frozenset(sequence)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (sequence, terms, _guarded(terms), time.monotonic(), value)
+            size = len(terms)
+            for term in terms:
+                self._postings.setdefault((term, size), set()).add(key)
+            self._df.update(terms)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self._df.clear()
+
+    def _nearest(self, sequence):
+        terms = frozenset(sequence)
+        guarded = _guarded(terms)
+        threshold = max(self.similarity, 1e-6)
+        size = len(terms)
+        min_size = max(1, math.ceil(threshold * size - 1e-9))
+        max_size = math.floor(size / threshold + 1e-9)
+        prefix = sorted(terms, key=lambda t: (self._df[t], t))[:size - min_size + 1]
+        best, best_score = None, threshold
+        seen = set()
+        for other_size in range(min_size, max_size + 1):
+            for term in prefix:
+                for candidate in self._postings.get((term, other_size), ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    other_sequence, other, other_guarded, _, _ = self._entries[candidate]
+                    if guarded != other_guarded:
+                        continue
+                    score = jaccard(terms, other)
+                    if score >= best_score and not _swapped(sequence, other_sequence, terms & other):
+                        best, best_score = candidate, score
+        return best, best_score
+
+    def _remove(self, key):
+        terms = self._entries.pop(key)[1]
+        size = len(terms)
+        for term in terms:
+            posting = self._postings[(term, size)]
+            posting.discard(key)
+            if not posting:
+                del self._postings[(term, size)]
+            self._df[term] -= 1
+            if not self._df[term]:
+                del self._df[term]
+
+
+response_cache = PromptCache()
+
+
+def configure_cache(section):
+    """Applies a [cache] config section (values may be strings from the environment)"""
+    section = section or {}
+    if "similarity" in section:
+        response_cache.similarity = float(section["similarity"])
+    if "max_entries" in section:
+        response_cache.max_entries = int(section["max_entries"])
+    if "ttl" in section:
+        response_cache.ttl = float(section["ttl"])
@@ -0,0 +1,112 @@
+"""Headless batch verification: claims in, JSONL results out
+
+    python -m factverify claims.txt --config .streamlit/secrets.toml
+    cat claims.txt | python -m factverify -c 8 > results.jsonl
+
+Each non-empty input line is one claim. Results are written in input order,
+one JSON object per line, as soon as every earlier claim has finished. At
+most --concurrency claims are in flight, plus a reorder window of the same
+size, so memory stays bounded however long the input is.
+"""
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import json
+import sys
+import time
+
+from .breaker import breaker_status
+from .cache import configure_cache
+from .config import load_config
+from .metrics import metrics
+from .upstreams import HealthMonitor, upstream_origins
+from .verify import VERIFY_TIMEOUT, Deadline, get_verified_response
+
+
+def verify_claim(line_no, claim, llama_config, timeout, use_cache=True):
+    started = time.monotonic()
+    meta = {}
+    response, sources = get_verified_response(claim, llama_config, deadline=Deadline(timeout), use_cache=use_cache,
+                                              meta=meta)
+    result = {
+        "line": line_no,
+        "claim": claim,
+        "ok": response is not None,
+        "elapsed_ms": round((time.monotonic() - started) * 1000),
+    }
+    if response is not None:
+        result.update(meta, response=response, sources=sources)
+    else:
+        result["errors"] = sources
+    return result
+
+
+def read_claims(stream):
+    for line_no, line in enumerate(stream, 1):
+        claim = line.strip()
+        if claim:
+            yield line_no, claim
+
+
+def run(claims, llama_config, out, concurrency=4, timeout=VERIFY_TIMEOUT, use_cache=True):
+    """Verifies claims concurrently and writes ordered JSONL; returns failures"""
+    failures = 0
+    pending = deque()
+    window = max(1, concurrency) * 2
+
+    def drain(block):
+        nonlocal failures
+        while pending and (block or pending[0].done()):
+            result = pending.popleft().result()
+            failures += not result["ok"]
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            block = False
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for line_no, claim in claims:
+            if len(pending) >= window:
+                drain(block=True)
+            pending.append(pool.submit(verify_claim, line_no, claim, llama_config, timeout, use_cache))
+            drain(block=False)
+        while pending:
+            drain(block=True)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="factverify", description="Verify claims and stream JSONL results")
+    parser.add_argument("input", nargs="?", default="-", help="file with one claim per line (default: stdin)")
+    parser.add_argument("--config", help="TOML file with a [llama] section (default: $FACTVERIFY_CONFIG)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="claims verified in parallel")
+    parser.add_argument("--timeout", type=float, default=VERIFY_TIMEOUT, help="per-claim deadline in seconds")
+    parser.add_argument("--structured", action="store_true", help="ask for JSON answers with verdict and confidence")
+    parser.add_argument("--no-cache", action="store_true", help="always call the model")
+    parser.add_argument("--metrics", action="store_true", help="print counters to stderr when done")
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot read config: {e}")
+    if "llama" not in config:
+        parser.error("missing LLM API configuration (set FACTVERIFY_LLAMA_API_KEY/_API_URL or --config)")
+
+    if args.structured:
+        config["llama"]["structured"] = True
+    configure_cache(config.get("cache"))
+    # Pay DNS and TLS set-up once, before the first batch of workers starts
+    for name, result in HealthMonitor(upstream_origins(config)).probe_all().items():
+        if not result["healthy"]:
+            print(f"warning: {name} upstream probe failed: {result.get('error', result.get('status_code'))}",
+                  file=sys.stderr)
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        failures = run(read_claims(stream), config["llama"], sys.stdout, args.concurrency, args.timeout,
+                       not args.no_cache)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    if args.metrics:
+        print(json.dumps({"counters": metrics.snapshot(), "breakers": breaker_status()}), file=sys.stderr)
+    return 1 if failures else 0
@@ -0,0 +1,57 @@
+"""Configuration from environment variables or a TOML file
+
+The TOML file uses the same layout as .streamlit/secrets.toml, so the
+secrets file itself can be passed to the CLI:
+
+    [firebase]
+    api_key = "..."
+    [llama]
+    api_key = "..."
+    api_url = "https://api.groq.com/openai/v1/chat/completions"
+    structured = true       # optional: JSON answers with verdict and confidence
+    [cache]                 # optional
+    similarity = 0.8        # Jaccard threshold for paraphrase hits, 1 = exact only
+    [health]                # optional
+    interval = 30           # seconds between upstream probes
+    ready_port = 8502       # serve /ready and /health for the load balancer
+
+Environment variables (FACTVERIFY_<SECTION>_<KEY>, e.g.
+FACTVERIFY_LLAMA_API_KEY) override values read from the file.
+"""
+import os
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+ENV_PREFIX = "FACTVERIFY_"
+CONFIG_ENV = "FACTVERIFY_CONFIG"
+SECTIONS = {
+    "firebase": ("api_key", "auth_domain", "project_id"),
+    "llama": ("api_key", "api_url", "structured"),
+    "cache": ("similarity", "max_entries", "ttl"),
+    "health": ("interval", "ready_port"),
+    "session": ("secret", "backend", "path", "redis_url", "ttl", "cache_ttl"),
+    "speculative": ("enabled", "debounce", "max_inflight", "max_per_minute", "timeout"),
+    "memory": ("max_value_kib", "max_session_kib", "idle_minutes", "diagnostics_token"),
+}
+
+
+def load_config(path=None, environ=None):
+    """Returns {section: {key: value}}; sections with no values are omitted"""
+    environ = os.environ if environ is None else environ
+    path = path or environ.get(CONFIG_ENV)
+    config = {}
+    if path:
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+        for section in SECTIONS:
+            if isinstance(data.get(section), dict):
+                config[section] = dict(data[section])
+    for section, keys in SECTIONS.items():
+        for key in keys:
+            value = environ.get(f"{ENV_PREFIX}{section.upper()}_{key.upper()}")
+            if value:
+                config.setdefault(section, {})[key] = value
+    return config
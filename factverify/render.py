@@ -0,0 +1,69 @@
+"""HTML fragments for the main app, kept free of Streamlit so they can be benchmarked"""
+
+MOTIVATIONAL_MESSAGES = (
+    "What fact shall we verify today?",
+    "Ready to uncover the truth?",
+    "Knowledge is power - let's find some!",
+    "Every search brings us closer to truth",
+    "Let's explore something fascinating!"
+)
+
+SOURCES_HEADING_HTML = """
+    <div style="margin-top: 2rem;">
+        <h3 style="color: var(--text-secondary); margin-bottom: 1rem;">
+            📚 Verified Sources:
+        </h3>
+"""
+
+
+def greeting_for_hour(hour):
+    if 5 <= hour < 12:
+        return "Good Morning"
+    elif 12 <= hour < 17:
+        return "Good Afternoon"
+    return "Good Evening"
+
+
+def display_name_for(first_name, last_name, email):
+    return f"{first_name[0].upper()}. {last_name}" if first_name else email.split('@')[0]
+
+
+def header_html(display_name, greeting, message):
+    return f"""
+        <div style="display: flex; align-items: center; gap: 1rem; margin-bottom: 2rem;">
+            <div class="user-avatar">
+                {display_name[0].upper()}
+            </div>
+            <div>
+                <h1 style="margin: 0; color: var(--text); font-size: 1.8rem;">{greeting}, {display_name}</h1>
+                <p style="margin: 0; color: var(--text-secondary); font-size: 1.1rem;">{message}</p>
+            </div>
+        </div>
+    """
+
+
+def response_html(response):
+    return f"""
+        <div class="response-card">
+            <p style="color: var(--text); font-size: 1.1rem; line-height: 1.6;">{response}</p>
+        </div>
+    """
+
+
+def verdict_html(verdict, confidence=None):
+    label = {"true": "Supported", "false": "Refuted", "mixed": "Mixed evidence"}.get(verdict, "Unverified")
+    if confidence is not None:
+        label += f" · {confidence:.0%} confidence"
+    return f"""
+        <p style="margin: 1rem 0 0; color: var(--text-secondary); font-size: 0.95rem;">
+            Verdict: <strong style="color: var(--text);">{label}</strong>
+        </p>
+    """
+
+
+def source_html(source):
+    return f"""
+        <div class="source-item">
+            <p style="margin: 0; color: var(--text); font-size: 1rem;">{source}</p>
+        </div>
+    """
@@ -0,0 +1,53 @@
+"""Runs the Streamlit app with the health monitor started at process start
+
+    python -m factverify.serve app.py
+    python -m factverify.serve app.py --config .streamlit/secrets.toml -- --server.port 8501
+
+The monitor warms the upstream connections and serves /ready before the
+first page load, so a load balancer that only routes to ready replicas can
+bring this one in. The app picks up the same monitor through
+``start_health_monitor``. Arguments after ``--`` go to ``streamlit run``.
+"""
+import argparse
+import os
+import sys
+
+from .config import load_config
+from .upstreams import PROBE_INTERVAL, start_health_monitor
+
+DEFAULT_SECRETS = os.path.join(".streamlit", "secrets.toml")
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    streamlit_args = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, streamlit_args = argv[:split], argv[split + 1:]
+    parser = argparse.ArgumentParser(prog="factverify.serve", description="Run the app with warm upstreams")
+    parser.add_argument("script", help="Streamlit script to run, e.g. app.py")
+    parser.add_argument("--config", help="TOML file with [firebase], [llama] and [health] sections "
+                                         "(default: $FACTVERIFY_CONFIG or .streamlit/secrets.toml)")
+    args = parser.parse_args(argv)
+
+    path = args.config or os.environ.get("FACTVERIFY_CONFIG")
+    if path is None and os.path.exists(DEFAULT_SECRETS):
+        path = DEFAULT_SECRETS
+    try:
+        config = load_config(path)
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot read config: {e}")
+
+    health = config.get("health", {})
+    start_health_monitor(
+        config,
+        interval=float(health.get("interval", PROBE_INTERVAL)),
+        ready_port=health.get("ready_port")
+    )
+
+    from streamlit.web import cli as streamlit_cli
+    return streamlit_cli.main(["run", args.script, *streamlit_args], prog_name="streamlit")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Per-session memory accounting, size caps and idle reaping
+
+Sessions report their id with ``touch`` on every run. The registry keeps
+only ids and last-seen times; ``lookup`` maps an id to the session's live
+state (any mapping with keys/get/del, such as Streamlit's SessionState), or
+None once the session is closed, which drops it from the registry.
+``running`` says whether a session's script is running right now; the reaper
+leaves those alone, since a run that is reading its state is not idle.
+
+``enforce`` keeps a session under its caps by moving large evictable values
+(cached results) to the shared store, or dropping them if there is none,
+and leaving a small stub behind. The reaper trims sessions idle for longer
+than ``idle_seconds`` down to the keys that keep the user logged in.
+``profile`` gives the per-session, per-key breakdown for the diagnostics
+page.
+"""
+import os
+import sys
+import threading
+import time
+import types
+
+from .metrics import metrics
+
+MAX_VALUE_BYTES = 64 * 1024
+MAX_SESSION_BYTES = 256 * 1024
+IDLE_SECONDS = 30 * 60
+REAP_INTERVAL = 60
+EVICTED_TTL = 3600
+# Enough to stay logged in (and restore from the shared store) after reaping
+PERSISTENT_KEYS = frozenset((
+    "logged_in", "email", "first_name", "last_name", "id_token", "session_id", "speculation_key"
+))
+_EVICTED = "__evicted__"
+
+
+def deep_sizeof(obj, _seen=None):
+    """Approximate bytes reachable from obj, counting shared objects once"""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, types.FunctionType):
+        # Callbacks keep whatever their closure captured alive
+        for cell in obj.__closure__ or ():
+            try:
+                size += deep_sizeof(cell.cell_contents, seen)
+            except ValueError:
+                pass
+    if hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += deep_sizeof(getattr(obj, slot), seen)
+    return size
+
+
+def process_rss_bytes():
+    """Current resident set size, or None where /proc isn't available
+
+    getrusage only reports the peak (in KiB on Linux, bytes on macOS), which
+    never goes down after a reap, so it is no stand-in.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _items(state):
+    # Streamlit's SessionState exposes a copy of user and keyed widget state
+    items = getattr(state, "filtered_state", None)
+    return dict(items if items is not None else state)
+
+
+def is_evicted(value):
+    return isinstance(value, dict) and _EVICTED in value
+
+
+class SessionRegistry:
+    def __init__(self, max_value_bytes=MAX_VALUE_BYTES, max_session_bytes=MAX_SESSION_BYTES,
+                 idle_seconds=IDLE_SECONDS, offload=None, on_reap=None, lookup=None, running=None):
+        self.max_value_bytes = max_value_bytes
+        self.max_session_bytes = max_session_bytes
+        self.idle_seconds = idle_seconds
+        self.offload = offload
+        self.on_reap = on_reap
+        self.lookup = lookup or (lambda session_id: None)
+        self.running = running or (lambda session_id: False)
+        self._lock = threading.Lock()
+        self._sessions = {}  # session id -> last seen
+        self._reaper = None
+
+    def touch(self, session_id):
+        with self._lock:
+            self._sessions[session_id] = time.monotonic()
+
+    def enforce(self, session_id, state, evictable):
+        """Moves evictable values out until the session fits its caps"""
+        sizes = {key: deep_sizeof(value) for key, value in _items(state).items()}
+        total = sum(sizes.values())
+        candidates = sorted((key for key in evictable if key in sizes and not is_evicted(state[key])),
+                            key=sizes.get, reverse=True)
+        for key in candidates:
+            if sizes[key] <= self.max_value_bytes and total <= self.max_session_bytes:
+                break
+            stub = {_EVICTED: None}
+            if self.offload is not None:
+                stub[_EVICTED] = f"evicted:{session_id}:{key}"
+                self.offload.set(stub[_EVICTED], state[key], EVICTED_TTL)
+            state[key] = stub
+            total -= sizes[key] - deep_sizeof(stub)
+            metrics.incr("session_values_evicted")
+
+    def load(self, state, key):
+        """Returns a value, fetching it back from the shared store if it was evicted"""
+        value = state[key] if key in state else None
+        if not is_evicted(value):
+            return value
+        if value[_EVICTED] is None or self.offload is None:
+            return None
+        return self.offload.get(value[_EVICTED])
+
+    def _live_sessions(self):
+        """[(session id, state, last seen)], forgetting sessions that have closed"""
+        with self._lock:
+            sessions = list(self._sessions.items())
+        live = []
+        for session_id, last_seen in sessions:
+            state = self.lookup(session_id)
+            if state is None:
+                with self._lock:
+                    if self._sessions.get(session_id) == last_seen:
+                        del self._sessions[session_id]
+            else:
+                live.append((session_id, state, last_seen))
+        return live
+
+    def reap(self):
+        now = time.monotonic()
+        reaped = 0
+        for session_id, state, last_seen in self._live_sessions():
+            if now - last_seen < self.idle_seconds or self.running(session_id):
+                continue
+            with self._lock:
+                if self._sessions.get(session_id) != last_seen:
+                    continue  # touched by a run that started since the scan
+            if self.on_reap is not None:
+                self.on_reap(session_id, state)
+            for key in list(_items(state)):
+                if key not in PERSISTENT_KEYS:
+                    try:
+                        del state[key]
+                    except KeyError:
+                        pass
+            with self._lock:
+                self._sessions.pop(session_id, None)
+            reaped += 1
+        if reaped:
+            metrics.incr("sessions_reaped", reaped)
+        return reaped
+
+    def profile(self):
+        """[{session, idle_s, bytes, keys: {key: bytes}}], largest session first"""
+        now = time.monotonic()
+        rows = []
+        for session_id, state, last_seen in self._live_sessions():
+            keys = {key: deep_sizeof(value) for key, value in _items(state).items()}
+            rows.append({
+                "session": session_id,
+                "idle_s": round(now - last_seen),
+                "bytes": sum(keys.values()),
+                "keys": keys,
+            })
+        return sorted(rows, key=lambda row: row["bytes"], reverse=True)
+
+    def start_reaper(self, interval=REAP_INTERVAL):
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reap()
+                except Exception:
+                    metrics.incr("session_reap_errors")
+        self._reaper = threading.Thread(target=run, name="session-reaper", daemon=True)
+        self._reaper.start()
+        return self
@@ -0,0 +1,165 @@
+"""Shared session store so any replica can serve any logged-in user
+
+A session is a small JSON dict (email, names) kept under a random session id
+in a store every replica can reach. The Firebase ID token is not shared: it
+expires after an hour, long before the session does.
+
+    [session]
+    secret = "..."               # HMAC key for the session cookie, same on every replica
+    backend = "sqlite"           # or "redis"
+    path = "sessions.sqlite3"    # sqlite backend
+    redis_url = "redis://localhost:6379/0"
+    ttl = 43200                  # session lifetime in seconds
+    cache_ttl = 5                # in-process read cache
+
+The browser only holds a signed cookie, "<session id>.<expiry>.<signature>",
+so a restart or a reconnect to another replica restores the session without
+a new Firebase login.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import sqlite3
+import threading
+import time
+
+from .metrics import metrics
+
+COOKIE_NAME = "factverify_session"
+SESSION_TTL = 12 * 3600
+CACHE_TTL = 5
+
+
+def new_session_id():
+    return secrets.token_urlsafe(24)
+
+
+def _signature(payload, secret):
+    digest = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def sign_session_cookie(session_id, expires_at, secret):
+    payload = f"{session_id}.{int(expires_at)}"
+    return f"{payload}.{_signature(payload, secret)}"
+
+
+def verify_session_cookie(value, secret, now=None):
+    """Returns the session id of a valid, unexpired cookie, else None"""
+    try:
+        session_id, expires_at, signature = (value or "").rsplit(".", 2)
+        expired = int(expires_at) < (now or time.time())
+    except ValueError:
+        return None
+    if expired or not hmac.compare_digest(signature, _signature(f"{session_id}.{expires_at}", secret)):
+        return None
+    return session_id
+
+
+class SQLiteSessionStore:
+    """Default backend: one SQLite file, shareable by replicas on the same host or volume"""
+    def __init__(self, path="sessions.sqlite3"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (key, data, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl)
+            )
+            self._db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+
+class RedisSessionStore:
+    """Any server speaking the Redis protocol (Redis, Valkey, KeyDB, a local stand-in)"""
+    def __init__(self, url="redis://localhost:6379/0", prefix="factverify:session:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis session backend needs the 'redis' package (pip install redis)")
+        self._client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self._client.get(self.prefix + key)
+        return json.loads(data) if data else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+
+class CachedSessionStore:
+    """Serves repeat reads from memory for cache_ttl seconds in front of a shared backend"""
+    def __init__(self, backend, cache_ttl=CACHE_TTL):
+        self.backend = backend
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._cache = {}  # key -> (fetched at, value)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached and now - cached[0] < self.cache_ttl:
+            metrics.incr("session_cache_hits")
+            return cached[1]
+        metrics.incr("session_cache_misses")
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self._cache.pop(key, None)
+            else:
+                self._cache[key] = (now, value)
+                self._expire(now)
+        return value
+
+    def set(self, key, value, ttl):
+        self.backend.set(key, value, ttl)
+        now = time.monotonic()
+        with self._lock:
+            self._cache[key] = (now, value)
+            self._expire(now)
+
+    def delete(self, key):
+        self.backend.delete(key)
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def _expire(self, now):
+        if len(self._cache) > 1024:
+            self._cache = {k: v for k, v in self._cache.items() if now - v[0] < self.cache_ttl}
+
+
+def open_session_store(section):
+    """Builds the configured store from a [session] config section"""
+    section = section or {}
+    backend = section.get("backend", "sqlite")
+    if backend == "redis":
+        store = RedisSessionStore(section.get("redis_url", "redis://localhost:6379/0"))
+    elif backend == "sqlite":
+        store = SQLiteSessionStore(section.get("path", "sessions.sqlite3"))
+    else:
+        raise ValueError(f"Unknown session backend: {backend}")
+    return CachedSessionStore(store, float(section.get("cache_ttl", CACHE_TTL)))
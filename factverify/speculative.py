@@ -0,0 +1,161 @@
+"""Speculative pre-verification of a draft query
+
+A frontend reports each draft with ``schedule``. Once the draft has been
+stable for ``debounce`` seconds, its verification starts in the background
+and lands in the response cache. On submit, ``claim`` hands back that call,
+finished or still running, so the caller can return the result at once or
+attach to the in-flight request. A newer draft cancels the session's older
+speculative call. The submitted draft stays noted as claimed, so the reruns
+that follow a submit don't speculate on it again.
+
+Speculation spends tokens on drafts that may never be submitted, so it has
+its own limits: at most ``max_inflight`` calls at a time, ``max_per_minute``
+starts across all sessions, and a shorter deadline. The hit rate
+(claimed / started) is reported in metrics to tune those limits; calls that
+are replaced or discarded without being claimed count as unclaimed.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from .metrics import metrics
+from .verify import CancelToken, Deadline, get_verified_response
+
+DEBOUNCE = 1.5
+MAX_INFLIGHT = 4
+MAX_PER_MINUTE = 30
+SPECULATIVE_TIMEOUT = 45
+MIN_PROMPT_CHARS = 12
+
+
+def _draft_key(prompt):
+    return " ".join(prompt.split()).lower()
+
+
+class _Speculation:
+    def __init__(self, key):
+        self.key = key
+        self.token = CancelToken()
+        self.timer = None
+        self.future = None
+        self.claimed = False
+
+
+class Speculator:
+    def __init__(self, debounce=DEBOUNCE, max_inflight=MAX_INFLIGHT, max_per_minute=MAX_PER_MINUTE,
+                 timeout=SPECULATIVE_TIMEOUT):
+        self.debounce = debounce
+        self.max_inflight = max_inflight
+        self.max_per_minute = max_per_minute
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sessions = {}  # session key -> _Speculation
+        self._inflight = 0
+        self._starts = deque()  # monotonic start times within the last minute
+        self._pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="speculative")
+
+    def schedule(self, session_key, prompt, llama_config):
+        """Notes the session's current draft; verification starts once it stays unchanged"""
+        key = _draft_key(prompt or "")
+        with self._lock:
+            current = self._sessions.get(session_key)
+            if current is not None and current.key == key:
+                return
+            self._discard(session_key)
+            if len(key) < MIN_PROMPT_CHARS:
+                return
+            spec = self._sessions[session_key] = _Speculation(key)
+            spec.timer = threading.Timer(self.debounce, self._start, (session_key, spec, prompt, llama_config))
+            spec.timer.daemon = True
+            spec.timer.start()
+
+    def claim(self, session_key, prompt):
+        """Returns (future, cancel token) of a speculative call for this prompt, or None"""
+        key = _draft_key(prompt)
+        with self._lock:
+            spec = self._sessions.get(session_key)
+            # The submitted prompt is now the caller's; keep later reruns from scheduling it
+            marker = self._sessions[session_key] = _Speculation(key)
+            marker.claimed = True
+            if spec is None or spec.claimed:
+                return None
+            spec.timer.cancel()
+            if spec.key != key or spec.future is None:
+                self._cancel(spec)
+                return None
+            spec.claimed = True
+        metrics.incr("speculative_hits" if spec.future.done() else "speculative_attached")
+        return spec.future, spec.token
+
+    def discard(self, session_key):
+        with self._lock:
+            self._discard(session_key)
+
+    def status(self):
+        started = metrics.get("speculative_started")
+        claimed = metrics.get("speculative_hits") + metrics.get("speculative_attached")
+        with self._lock:
+            inflight = self._inflight
+        return {
+            "inflight": inflight,
+            "started": started,
+            "claimed": claimed,
+            "hit_rate": round(claimed / started, 3) if started else None,
+        }
+
+    def _start(self, session_key, spec, prompt, llama_config):
+        now = time.monotonic()
+        with self._lock:
+            if self._sessions.get(session_key) is not spec:
+                return
+            while self._starts and now - self._starts[0] > 60:
+                self._starts.popleft()
+            if self._inflight >= self.max_inflight or len(self._starts) >= self.max_per_minute:
+                metrics.incr("speculative_skipped_budget")
+                del self._sessions[session_key]
+                return
+            self._starts.append(now)
+            self._inflight += 1
+            spec.future = self._pool.submit(self._run, spec, prompt, llama_config)
+        metrics.incr("speculative_started")
+
+    def _run(self, spec, prompt, llama_config):
+        meta = {}
+        try:
+            response, sources = get_verified_response(
+                prompt, llama_config, deadline=Deadline(self.timeout), cancel_token=spec.token, meta=meta
+            )
+            return response, sources, meta
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    def _discard(self, session_key):
+        spec = self._sessions.pop(session_key, None)
+        if spec is not None:
+            if spec.timer is not None:
+                spec.timer.cancel()
+            self._cancel(spec)
+
+    def _cancel(self, spec):
+        """Gives up on a started call nobody claimed, stopping it if it is still running"""
+        if spec.future is None or spec.claimed:
+            return
+        metrics.incr("speculative_unclaimed")
+        if not spec.future.done():
+            spec.token.cancel("draft changed")
+            metrics.incr("speculative_cancelled")
+
+
+def configure_speculator(section):
+    """Builds a Speculator from a [speculative] config section, or None when disabled"""
+    section = section or {}
+    if str(section.get("enabled", "")).lower() not in ("1", "true", "yes", "on"):
+        return None
+    return Speculator(
+        debounce=float(section.get("debounce", DEBOUNCE)),
+        max_inflight=int(section.get("max_inflight", MAX_INFLIGHT)),
+        max_per_minute=int(section.get("max_per_minute", MAX_PER_MINUTE)),
+        timeout=float(section.get("timeout", SPECULATIVE_TIMEOUT)),
+    )
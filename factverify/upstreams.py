@@ -0,0 +1,160 @@
+"""Shared HTTP connection pool, start-up warm-up and upstream health probes
+
+Every call to Firebase and the LLM endpoint goes through ``session`` so TLS
+connections are reused instead of being set up per request. ``HealthMonitor``
+resolves and connects to each configured upstream in the background as soon
+as it starts, then re-probes on an interval shorter than
+typical server keep-alive timeouts, which keeps the pooled connections open
+and feeds a readiness status. It can also serve that status over HTTP for a
+load balancer:
+
+    GET /ready  -> 200 when every upstream is warm and healthy, else 503
+    GET /health -> 200 with the per-upstream probe results as JSON
+
+Start it with the process rather than the first page load, so a replica can
+become ready before any user is routed to it:
+
+    python -m factverify.serve app.py -- --server.port 8501
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import metrics
+
+PROBE_INTERVAL = 30
+PROBE_TIMEOUT = 5
+# Any 5xx means the upstream is failing, except 501: probes use HEAD, and a
+# server that doesn't implement HEAD still proves DNS, TCP and TLS are up.
+# Any other answer means the connection is up and pooled
+HEAD_NOT_IMPLEMENTED = 501
+
+
+def is_healthy_status(status_code):
+    return status_code < 500 or status_code == HEAD_NOT_IMPLEMENTED
+
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+
+def upstream_origins(config):
+    """{name: origin URL} of every upstream present in the config"""
+    from .auth import IDENTITY_TOOLKIT_URL
+
+    origins = {}
+    if config.get("firebase"):
+        origins["firebase"] = IDENTITY_TOOLKIT_URL
+    if config.get("llama", {}).get("api_url"):
+        origins["llama"] = config["llama"]["api_url"]
+    return {name: "{0.scheme}://{0.netloc}/".format(urlsplit(url)) for name, url in origins.items()}
+
+
+def probe(origin, timeout=PROBE_TIMEOUT):
+    """Resolves and connects to an origin through the shared pool"""
+    parts = urlsplit(origin)
+    result = {"checked_at": time.time()}
+    started = time.monotonic()
+    try:
+        socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        result["dns_ms"] = round((time.monotonic() - started) * 1000, 1)
+        response = session.head(origin, timeout=timeout, allow_redirects=False)
+        result["healthy"] = is_healthy_status(response.status_code)
+        result["status_code"] = response.status_code
+    except Exception as e:
+        result["healthy"] = False
+        result["error"] = str(e)
+    result["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+
+class HealthMonitor:
+    """Keeps upstream connections warm and tracks whether the replica is ready"""
+    def __init__(self, origins, interval=PROBE_INTERVAL):
+        self.origins = dict(origins)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._status = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+    def probe_all(self):
+        for name, origin in self.origins.items():
+            result = probe(origin)
+            metrics.incr(f"probe_{name}_{'ok' if result['healthy'] else 'failed'}")
+            with self._lock:
+                self._status[name] = result
+        return self.status()
+
+    def status(self):
+        with self._lock:
+            return {name: dict(result) for name, result in self._status.items()}
+
+    def ready(self):
+        status = self.status()
+        return all(status.get(name, {}).get("healthy") for name in self.origins)
+
+    def start(self):
+        """Warms every upstream in the background and keeps probing on the interval"""
+        self._thread = threading.Thread(target=self._run, name="upstream-health", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def serve(self, port, host="0.0.0.0"):
+        """Serves /ready and /health on a side port for the load balancer"""
+        monitor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/ready", "/health"):
+                    self.send_error(404)
+                    return
+                ready = monitor.ready()
+                code = 200 if ready or self.path == "/health" else 503
+                body = json.dumps({"ready": ready, "upstreams": monitor.status()}).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="readiness", daemon=True).start()
+        return self._server.server_address[1]
+
+    def _run(self):
+        # Not ready until this first pass finishes; nobody waits on it
+        self.probe_all()
+        while not self._stop.wait(self.interval):
+            self.probe_all()
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def start_health_monitor(config, interval=PROBE_INTERVAL, ready_port=None):
+    """Starts the process-wide monitor; later calls return the running one"""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = HealthMonitor(upstream_origins(config), interval).start()
+            if ready_port:
+                _monitor.serve(int(ready_port))
+        return _monitor
@@ -0,0 +1,426 @@
+"""Claim verification against the Groq chat completions endpoint"""
+from datetime import datetime
+import json
+import socket
+import threading
+import time
+
+from .breaker import CircuitOpenError, breakers, is_upstream_failure
+from .cache import response_cache
+from .metrics import metrics
+from .upstreams import session
+
+VERIFY_TIMEOUT = 60
+MAX_COMPLETION_TOKENS = 2000
+# Breaker slow-call threshold for structured calls, whose first byte is the whole generation
+STRUCTURED_SLOW_SECONDS = 45
+# How often on_progress is called while a non-streamed body is being read
+READ_POLL_SECONDS = 0.25
+
+
+class VerificationCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    """Cancels an in-flight verification; callbacks run once on cancel"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = ""
+
+    @property
+    def cancelled(self):
+        return bool(self.reason)
+
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self.reason:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def clear(self):
+        """Drops cancel callbacks once the call is over, so they don't pin the response"""
+        with self._lock:
+            self._callbacks = []
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self.reason:
+                return
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+
+class Deadline:
+    """Absolute time budget shared by every stage of one verification"""
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def _socket_of(response):
+    raw = getattr(response, "raw", None)
+    sock = getattr(getattr(raw, "_connection", None), "sock", None)
+    if sock is None:
+        # Connection: close responses detach the socket from the connection; the body file still has it
+        body = getattr(getattr(getattr(raw, "_fp", None), "fp", None), "raw", None)
+        sock = getattr(body, "_sock", None)
+    return sock
+
+
+def _abort(response):
+    """Shuts the socket down so a read blocked in another thread returns now"""
+    sock = _socket_of(response)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    response.close()
+
+
+def _stream_completion(response, deadline, cancel_token, on_progress):
+    """Reads the SSE stream, returns (content, content chunks received, usage)"""
+    parts, received, usage = [], 0, None
+    for line in response.iter_lines(decode_unicode=True):
+        if cancel_token.cancelled:
+            raise VerificationCancelled(cancel_token.reason)
+        if deadline.expired:
+            raise VerificationCancelled("deadline exceeded")
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        chunk = json.loads(data)
+        usage = chunk.get("usage") or chunk.get("x_groq", {}).get("usage") or usage
+        for choice in chunk.get("choices", []):
+            delta = choice.get("delta", {}).get("content")
+            if delta:
+                parts.append(delta)
+                received += 1
+        if on_progress:
+            on_progress(received)
+    if cancel_token.cancelled:
+        # An aborted socket can end the stream early instead of raising
+        raise VerificationCancelled(cancel_token.reason)
+    return "".join(parts), received, usage
+
+
+def _read_completion(response, deadline, cancel_token, on_progress):
+    """Reads a non-streamed completion, returns (content, tokens received, usage)
+
+    With on_progress the body is read in a worker and on_progress(0) is called
+    every READ_POLL_SECONDS until it arrives, so a caller that stops from its
+    callback (an interrupted Streamlit run) doesn't wait out the generation.
+    """
+    if on_progress:
+        result = {}
+
+        def read():
+            try:
+                result["data"] = response.json()
+            except Exception as e:
+                result["error"] = e
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+        while reader.is_alive():
+            on_progress(0)
+            reader.join(READ_POLL_SECONDS)
+        if "error" in result and not cancel_token.cancelled:
+            raise result["error"]
+        data = result.get("data", {})
+    else:
+        data = response.json()
+    if cancel_token.cancelled:
+        raise VerificationCancelled(cancel_token.reason)
+    if deadline.expired:
+        raise VerificationCancelled("deadline exceeded")
+    usage = data.get("usage") or data.get("x_groq", {}).get("usage")
+    choices = data.get("choices") or [{}]
+    content = (choices[0].get("message") or {}).get("content") or ""
+    return content, (usage or {}).get("completion_tokens", 0), usage
+
+
+def _record_cancelled(received):
+    # Estimate what the call would have streamed from the average completed
+    # streamed call; received counts content chunks (about one token each)
+    streamed = metrics.get("streamed_completions")
+    if streamed:
+        expected = metrics.get("completion_chunks") / streamed
+    else:
+        expected = MAX_COMPLETION_TOKENS
+    metrics.incr("verify_cancelled")
+    metrics.incr("cancelled_chunks_received", received)
+    metrics.incr("cancelled_chunks_saved_est", int(max(expected - received, 0)))
+
+
+def _cancelled(reason):
+    if reason == "deadline exceeded":
+        metrics.incr("verify_deadline_exceeded")
+    return None, [f"Verification cancelled: {reason}"]
+
+
+STRUCTURED_SYSTEM_PROMPT = """You are a senior academic researcher. Information must be current to {month}.
+Reply with a single JSON object and nothing else:
+{{"answer": string, "verdict": "true"|"false"|"mixed"|"unverified", "confidence": number 0-1,
+"sources": [{{"title": string, "url": string, "author": string, "year": integer}}]}}
+Give 3-5 academic sources (DOIs or .edu/.gov URLs)."""
+VERDICTS = ("true", "false", "mixed", "unverified")
+
+# Cleared when the endpoint rejects response_format, so later calls skip straight to free-form
+_structured_supported = True
+
+
+def _json_mode_unsupported(error):
+    """True if a 400 says JSON mode itself is rejected, not that one generation failed validation"""
+    if error.get("code") == "json_validate_failed":
+        return False
+    if error.get("param") == "response_format":
+        return True
+    message = str(error.get("message", "")).lower()
+    return "response_format" in message or ("json" in message and "support" in message)
+
+
+def _build_payload(prompt, structured):
+    month = datetime.now().strftime('%B %Y')
+    if structured:
+        system = STRUCTURED_SYSTEM_PROMPT.format(month=month)
+    else:
+        system = f"""You are a senior academic researcher. Provide:
+1. Accurate information current to {month}
+2. 3-5 academic sources (DOIs or .edu/.gov URLs)
+3. Format: [Title](URL) - Author (Year) or DOI:..."""
+    payload = {
+        "model": "llama3-70b-8192",
+        "messages": [
+            {
+                "role": "system",
+                "content": system
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "temperature": 0.3,
+        "max_tokens": MAX_COMPLETION_TOKENS,
+        "top_p": 0.9,
+        # Groq's JSON mode doesn't stream, so structured answers arrive in one body
+        "stream": not structured
+    }
+    if structured:
+        payload["response_format"] = {"type": "json_object"}
+    return payload
+
+
+def _parse_freeform(content):
+    if "###SOURCES###" in content:
+        parts = content.split("###SOURCES###")
+        return parts[0].strip(), [s.strip() for s in parts[1].split("\n") if s.strip()], {}
+    return content, [], {}
+
+
+def _format_source(source):
+    if isinstance(source, str):
+        return source.strip()
+    title = str(source.get("title") or source.get("url") or "").strip()
+    url = str(source.get("url") or "").strip()
+    text = f"[{title}]({url})" if url else title
+    author = str(source.get("author") or "").strip()
+    year = source.get("year")
+    if author and year:
+        text += f" - {author} ({year})"
+    elif author or year:
+        text += f" - {author or year}"
+    return text
+
+
+def _parse_structured(content):
+    """Decodes and validates the JSON answer in one pass; None if it doesn't fit the schema"""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("answer"), str) or not data["answer"].strip():
+        return None
+    sources = data.get("sources") or []
+    if not isinstance(sources, list):
+        return None
+    verdict = str(data.get("verdict", "unverified")).lower()
+    try:
+        confidence = min(max(float(data.get("confidence")), 0.0), 1.0)
+    except (TypeError, ValueError):
+        confidence = None
+    details = {
+        "verdict": verdict if verdict in VERDICTS else "unverified",
+        "confidence": confidence,
+    }
+    formatted = [_format_source(source) for source in sources if isinstance(source, (str, dict))]
+    return data["answer"].strip(), [source for source in formatted if source], details
+
+
+def _record_completion(mode, tokens, elapsed, chunks=None):
+    metrics.incr("verify_completed")
+    metrics.incr("completion_tokens", tokens)
+    if chunks is not None:
+        metrics.incr("streamed_completions")
+        metrics.incr("completion_chunks", chunks)
+    metrics.incr(f"completions_{mode}")
+    metrics.incr(f"completion_tokens_{mode}", tokens)
+    metrics.incr(f"verify_ms_{mode}", round(elapsed * 1000))
+
+
+def get_verified_response(prompt, llama_config, deadline=None, cancel_token=None, on_progress=None,
+                          use_cache=True, structured=None, meta=None):
+    """Production-ready query with academic sources using Groq API
+
+    structured asks for a JSON answer (defaults to the llama config's
+    "structured" flag); it falls back to the free-form prompt if the endpoint
+    rejects JSON mode and to free-form parsing if the JSON is malformed.
+    If meta is a dict it is filled with mode, verdict, confidence and
+    completion_tokens.
+    """
+    global _structured_supported
+    if structured is None:
+        structured = str((llama_config or {}).get("structured", "")).lower() in ("1", "true", "yes", "on")
+    structured = structured and _structured_supported
+    meta = meta if meta is not None else {}
+    deadline = deadline or Deadline(VERIFY_TIMEOUT)
+    cancel_token = cancel_token or CancelToken()
+    response = None
+    deadline_timer = None
+    received = 0
+    finished = False
+    try:
+        if not llama_config or not llama_config.get("api_key") or not llama_config.get("api_url"):
+            finished = True
+            return None, ["Missing LLM API configuration"]
+        
+        cached = response_cache.get(prompt) if use_cache else None
+        if cached and structured and "verdict" not in cached[0][2]:
+            # A free-form answer has no verdict or confidence to give a structured caller
+            cached = None
+        if cached:
+            finished = True
+            (answer, sources, details), similarity = cached
+            metrics.incr("cache_hits_exact" if similarity >= 1 else "cache_hits_near")
+            meta.update(details, cached=True)
+            return answer, sources
+        if use_cache:
+            metrics.incr("cache_misses")
+            
+        headers = {
+            "Authorization": f"Bearer {llama_config['api_key']}",
+            "Content-Type": "application/json"
+        }
+        payload = _build_payload(prompt, structured)
+        
+        if cancel_token.cancelled:
+            raise VerificationCancelled(cancel_token.reason)
+        if deadline.expired:
+            raise VerificationCancelled("deadline exceeded")
+        # Fires even while a read is blocked on a stalled stream; cancelling aborts the socket
+        deadline_timer = threading.Timer(deadline.remaining(), cancel_token.cancel, ("deadline exceeded",))
+        deadline_timer.daemon = True
+        deadline_timer.start()
+        breaker = breakers["llama"]
+        ticket = breaker.acquire()
+        metrics.incr("verify_started")
+        started = time.monotonic()
+        try:
+            response = session.post(
+                llama_config["api_url"],
+                headers=headers,
+                json=payload,
+                stream=True,
+                timeout=(min(5.0, deadline.remaining()), deadline.remaining())
+            )
+        except Exception:
+            if cancel_token.cancelled:
+                breaker.release(ticket)
+            else:
+                breaker.record(ticket, False)
+            raise
+        breaker.record(ticket, not is_upstream_failure(response.status_code), time.monotonic() - started,
+                       slow_call_seconds=None if payload["stream"] else STRUCTURED_SLOW_SECONDS)
+        cancel_token.on_cancel(lambda: _abort(response))
+        
+        if response.status_code == 200:
+            def progress(count):
+                nonlocal received
+                received = count
+                if on_progress:
+                    on_progress(count)
+            if payload["stream"]:
+                content, received, usage = _stream_completion(response, deadline, cancel_token, progress)
+            else:
+                content, received, usage = _read_completion(response, deadline, cancel_token, on_progress)
+                progress(received)
+            finished = True
+            tokens = (usage or {}).get("completion_tokens", received)
+            mode = "structured" if structured else "freeform"
+            answer, sources, details = (_parse_structured(content) if structured else None) or _parse_freeform(content)
+            if structured and not details:
+                metrics.incr("structured_parse_fallbacks")
+                mode = "structured_fallback"
+            _record_completion(mode, tokens, time.monotonic() - started, received if payload["stream"] else None)
+            meta.update(details, mode=mode, completion_tokens=tokens)
+            if use_cache and answer:
+                response_cache.put(prompt, (answer, sources, details))
+            return answer, sources
+        
+        finished = True
+        error = response.json().get("error", {})
+        error_msg = error.get("message", "Unknown API error")
+        if structured and response.status_code == 400:
+            # Retry free-form within the same budget. Only stop asking for JSON
+            # when the endpoint (or this model) can't do JSON mode at all; a
+            # generation that failed JSON validation is a one-off
+            metrics.incr("structured_request_fallbacks")
+            if _json_mode_unsupported(error):
+                _structured_supported = False
+            response.close()
+            answer, sources = get_verified_response(prompt, llama_config, deadline, cancel_token, on_progress,
+                                                    use_cache=False, structured=False, meta=meta)
+            if use_cache and answer:
+                # Cached as free-form: without a verdict, structured lookups
+                # keep missing it until a JSON answer replaces it
+                response_cache.put(prompt, (answer, sources, {}))
+            return answer, sources
+        return None, [f"API Error: {error_msg}"]
+        
+    except CircuitOpenError as e:
+        finished = True
+        return None, [str(e)]
+    except VerificationCancelled as e:
+        return _cancelled(str(e))
+    except Exception as e:
+        if cancel_token.cancelled:
+            return _cancelled(cancel_token.reason)
+        finished = True
+        return None, [f"System Error: {str(e)}"]
+    finally:
+        if deadline_timer is not None:
+            deadline_timer.cancel()
+        if not finished:
+            # Superseded, logged out, timed out or the script run was interrupted
+            cancel_token.cancel("interrupted")
+            _record_cancelled(received)
+        if response is not None:
+            response.close()
+        cancel_token.clear()
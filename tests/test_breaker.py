@@ -0,0 +1,130 @@
+from types import SimpleNamespace
+
+import pytest
+
+from factverify import breaker as breaker_module
+from factverify import verify
+from factverify.breaker import MIN_CALLS, CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker_module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def trip(breaker):
+    while breaker.state == "closed":
+        breaker.record(breaker.acquire(), False)
+
+
+def test_opens_after_failure_rate_and_fails_fast(clock):
+    breaker = CircuitBreaker("test", "Test service", slow_call_seconds=5, open_seconds=30)
+    breaker.record(breaker.acquire(), True)
+    assert breaker.state == "closed"
+    trip(breaker)
+    assert breaker.state == "open"
+    assert breaker.retry_after() == 30
+    with pytest.raises(CircuitOpenError, match="Test service"):
+        breaker.acquire()
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = CircuitBreaker("test", "Test service", slow_call_seconds=5)
+    for _ in range(MIN_CALLS):
+        breaker.record(breaker.acquire(), True, elapsed=6)
+    assert breaker.state == "open"
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(clock):
+    breaker = CircuitBreaker("test", "Test service", slow_call_seconds=5, open_seconds=30)
+    trip(breaker)
+    clock.now += 30
+    assert breaker.state == "half_open"
+    probe = breaker.acquire()
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.record(probe, True)
+    assert breaker.state == "closed"
+    assert breaker.status()["recent_calls"] == 0
+    breaker.acquire()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("test", "Test service", slow_call_seconds=5, open_seconds=30)
+    trip(breaker)
+    clock.now += 30
+    breaker.record(breaker.acquire(), False)
+    assert breaker.state == "open"
+    assert breaker.retry_after() == 30
+
+
+def test_released_probe_slot_can_be_taken_again(clock):
+    breaker = CircuitBreaker("test", "Test service", slow_call_seconds=5, open_seconds=30)
+    trip(breaker)
+    clock.now += 30
+    breaker.release(breaker.acquire())
+    breaker.acquire()
+    assert breaker.state == "half_open"
+
+
+def test_call_from_before_the_trip_cannot_decide_half_open(clock):
+    breaker = CircuitBreaker("test", "Test service", slow_call_seconds=5, open_seconds=30)
+    slow = breaker.acquire()
+    trip(breaker)
+    clock.now += 30
+    probe = breaker.acquire()
+    breaker.record(slow, True)
+    assert breaker.state == "half_open"
+    breaker.record(slow, False)
+    assert breaker.state == "half_open"
+    breaker.release(slow)
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.record(probe, True)
+    assert breaker.state == "closed"
+
+
+def test_late_failures_from_before_the_trip_do_not_extend_it(clock):
+    breaker = CircuitBreaker("test", "Test service", slow_call_seconds=5, open_seconds=30)
+    in_flight = [breaker.acquire() for _ in range(MIN_CALLS)]
+    trip(breaker)
+    clock.now += 20
+    for ticket in in_flight:
+        breaker.record(ticket, False)
+    assert breaker.retry_after() == 10
+    clock.now += 10
+    assert breaker.state == "half_open"
+    breaker.record(breaker.acquire(), True)
+    assert breaker.state == "closed"
+    assert breaker.status()["recent_calls"] == 0
+
+
+def test_verify_fails_fast_once_the_llm_breaker_opens(clock, monkeypatch):
+    monkeypatch.setitem(breaker_module.breakers, "llama",
+                        CircuitBreaker("llama", "Verification service", slow_call_seconds=20))
+    calls = []
+
+    def post(url, **kwargs):
+        calls.append(url)
+        return SimpleNamespace(status_code=503, json=lambda: {"error": {"message": "overloaded"}},
+                               close=lambda: None)
+
+    monkeypatch.setattr(verify.session, "post", post)
+    config = {"api_key": "key", "api_url": "https://llm.invalid/v1/chat/completions"}
+    for _ in range(MIN_CALLS):
+        response, errors = verify.get_verified_response("claim", config, use_cache=False)
+        assert response is None and errors == ["API Error: overloaded"]
+    response, errors = verify.get_verified_response("claim", config, use_cache=False)
+    assert response is None
+    assert "Verification service is temporarily unavailable" in errors[0]
+    assert len(calls) == MIN_CALLS
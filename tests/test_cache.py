@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import pytest
+
+from factverify import cache as cache_module
+from factverify.cache import PromptCache, prompt_sequence
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_passive_and_active_voice_share_an_entry():
+    cache = PromptCache(similarity=1)
+    cache.put("Is climate change caused by humans?", "answer")
+    assert cache.get("Are humans causing climate change?") == ("answer", 1.0)
+
+
+@pytest.mark.parametrize("stored, lookup", [
+    ("Did Iraq invade Kuwait?", "Did Kuwait invade Iraq?"),
+    ("Do dogs eat cats?", "Do cats eat dogs?"),
+    ("Was Kuwait invaded by Iraq?", "Did Kuwait invade Iraq?"),
+])
+@pytest.mark.parametrize("similarity", [1, 0.8, 0.5])
+def test_swapped_roles_never_match(stored, lookup, similarity):
+    cache = PromptCache(similarity=similarity)
+    cache.put(stored, "answer")
+    assert cache.get(lookup) is None
+
+
+@pytest.mark.parametrize("stored, lookup", [
+    ("When did World War II end?", "When did World War I end?"),
+    ("Was Henry VIII married six times?", "Was Henry VII married six times?"),
+    ("Did the Western Roman Empire fall in 476?", "Did the Western Roman Empire fall in 1453?"),
+    ("Is coffee safe during pregnancy?", "Isn't coffee safe during pregnancy?"),
+    ("Is coffee safe during pregnancy?", "Is coffee not safe during pregnancy?"),
+])
+def test_numbers_and_negations_must_agree(stored, lookup):
+    cache = PromptCache(similarity=0.5)
+    cache.put(stored, "answer")
+    assert cache.get(lookup) is None
+
+
+def test_roman_numerals_need_a_preceding_content_word():
+    assert prompt_sequence("When did World War II end?") == ("world", "war", "2", "end")
+    assert prompt_sequence("World War 2") == prompt_sequence("World War II")
+    assert prompt_sequence("Can I eat eggs?") == ("eat", "eggs")
+    assert prompt_sequence("Is DC a state?") == ("dc", "stat")
+
+
+def test_near_duplicate_is_served_with_its_similarity():
+    cache = PromptCache(similarity=0.8)
+    cache.put("Did humans land on the moon in 1969?", "answer")
+    value, similarity = cache.get("Did humans really land on the moon in 1969?")
+    assert value == "answer" and similarity == 1.0
+    cache.put("Does sugar make children hyperactive?", "sugar")
+    value, similarity = cache.get("Does sugar make children very hyperactive?")
+    assert value == "sugar" and 0.8 <= similarity < 1
+
+
+def test_exact_only_skips_near_matches():
+    cache = PromptCache(similarity=1)
+    cache.put("Does sugar make children hyperactive?", "answer")
+    assert cache.get("Does sugar make children very hyperactive?") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PromptCache(max_entries=2, similarity=1)
+    cache.put("Is Pluto a planet?", "pluto")
+    cache.put("Is the Earth flat?", "earth")
+    assert cache.get("Is Pluto a planet?")[0] == "pluto"
+    cache.put("Who invented the telephone?", "telephone")
+    assert len(cache) == 2
+    assert cache.get("Is the Earth flat?") is None
+    assert cache.get("Is Pluto a planet?")[0] == "pluto"
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PromptCache(similarity=0.8, ttl=60)
+    cache.put("Is Pluto a planet?", "pluto")
+    clock.now += 59
+    assert cache.get("Is Pluto a planet?")[0] == "pluto"
+    clock.now += 2
+    assert cache.get("Is Pluto a planet?") is None
+    assert len(cache) == 0 and not cache._postings and not cache._df
+
+
+def test_removed_entries_leave_no_postings_or_counts():
+    cache = PromptCache(max_entries=1)
+    cache.put("Is Pluto a planet?", "pluto")
+    cache.put("Is Pluto a planet?", "pluto again")
+    assert cache._df == {"pluto": 1, "planet": 1}
+    assert cache._postings == {("pluto", 2): {"pluto planet"}, ("planet", 2): {"pluto planet"}}
+    cache.put("Is the Earth flat?", "earth")
+    assert set(cache._df) == {"earth", "flat"}
+    assert set(cache._postings) == {("earth", 2), ("flat", 2)}
+    cache.clear()
+    assert len(cache) == 0 and not cache._postings and not cache._df
+
+
+def test_prompts_without_content_words_are_not_cached():
+    cache = PromptCache()
+    cache.put("Is it true?", "answer")
+    assert len(cache) == 0 and cache.get("Is it true?") is None
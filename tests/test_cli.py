@@ -0,0 +1,121 @@
+import io
+import json
+import random
+import threading
+import time
+
+import pytest
+
+from factverify import cli
+from factverify.config import load_config
+
+LLAMA = {"api_key": "key", "api_url": "https://llm.invalid/v1/chat/completions"}
+
+
+@pytest.fixture
+def verified(monkeypatch):
+    """Stubbed verification: random latency, fails claims starting with "bad"; tracks concurrency"""
+    state = {"inflight": 0, "max_inflight": 0}
+    lock = threading.Lock()
+
+    def verify(claim, llama_config, deadline=None, use_cache=True, meta=None):
+        with lock:
+            state["inflight"] += 1
+            state["max_inflight"] = max(state["max_inflight"], state["inflight"])
+        time.sleep(random.uniform(0, 0.02))
+        with lock:
+            state["inflight"] -= 1
+        if claim.startswith("bad"):
+            return None, ["API Error: rejected"]
+        meta["mode"] = "freeform"
+        return f"answer to {claim}", []
+
+    monkeypatch.setattr(cli, "get_verified_response", verify)
+    monkeypatch.setattr(cli, "upstream_origins", lambda config: {})
+    return state
+
+
+def results(out):
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_results_come_out_in_input_order(verified):
+    claims = [(n, f"claim {n}") for n in range(1, 41)]
+    out = io.StringIO()
+    assert cli.run(iter(claims), LLAMA, out, concurrency=8) == 0
+    assert [r["line"] for r in results(out)] == list(range(1, 41))
+    assert all(r["ok"] and r["response"] == f"answer to {r['claim']}" for r in results(out))
+    assert verified["max_inflight"] <= 8
+
+
+def test_input_is_read_no_further_ahead_than_the_window(verified):
+    read = []
+
+    def claims():
+        for n in range(1, 101):
+            read.append(n)
+            yield n, f"claim {n}"
+
+    class Out(io.StringIO):
+        def write(self, text):
+            # Claims read so far minus results written is what is held in memory
+            line = json.loads(text)["line"]
+            assert len(read) - line <= 2 * 4
+            return super().write(text)
+
+    out = Out()
+    assert cli.run(claims(), LLAMA, out, concurrency=4) == 0
+    assert len(results(out)) == 100
+
+
+def test_failures_are_reported_and_counted(verified):
+    out = io.StringIO()
+    claims = [(1, "good claim"), (2, "bad claim"), (3, "another good one")]
+    assert cli.run(iter(claims), LLAMA, out, concurrency=2) == 1
+    failed = results(out)[1]
+    assert not failed["ok"] and failed["errors"] == ["API Error: rejected"]
+
+
+def test_read_claims_skips_blank_lines_and_keeps_line_numbers():
+    assert list(cli.read_claims(io.StringIO("first\n\n  \n second \n"))) == [(1, "first"), (4, "second")]
+
+
+def test_main_exit_code_reflects_failures(verified, tmp_path, monkeypatch, capsys):
+    claims = tmp_path / "claims.txt"
+    claims.write_text("good claim\nbad claim\n", encoding="utf-8")
+    monkeypatch.setenv("FACTVERIFY_LLAMA_API_KEY", "key")
+    monkeypatch.setenv("FACTVERIFY_LLAMA_API_URL", LLAMA["api_url"])
+    monkeypatch.delenv("FACTVERIFY_CONFIG", raising=False)
+    assert cli.main([str(claims), "--no-cache"]) == 1
+    assert len(capsys.readouterr().out.splitlines()) == 2
+    claims.write_text("good claim\n", encoding="utf-8")
+    assert cli.main([str(claims), "--no-cache"]) == 0
+
+
+def test_main_requires_llm_config(monkeypatch):
+    monkeypatch.delenv("FACTVERIFY_CONFIG", raising=False)
+    for name in ("FACTVERIFY_LLAMA_API_KEY", "FACTVERIFY_LLAMA_API_URL"):
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["-"])
+    assert exc.value.code == 2
+
+
+def test_environment_overrides_toml(tmp_path):
+    path = tmp_path / "secrets.toml"
+    path.write_text('[llama]\napi_key = "from-file"\napi_url = "https://file.invalid"\n'
+                    '[cache]\nsimilarity = 0.9\n[unrelated]\nkey = 1\n', encoding="utf-8")
+    config = load_config(str(path), environ={"FACTVERIFY_LLAMA_API_KEY": "from-env",
+                                             "FACTVERIFY_HEALTH_READY_PORT": "8502"})
+    assert config == {
+        "llama": {"api_key": "from-env", "api_url": "https://file.invalid"},
+        "cache": {"similarity": 0.9},
+        "health": {"ready_port": "8502"},
+    }
+
+
+def test_config_path_comes_from_the_environment(tmp_path):
+    path = tmp_path / "secrets.toml"
+    path.write_text('[firebase]\napi_key = "abc"\n', encoding="utf-8")
+    assert load_config(environ={"FACTVERIFY_CONFIG": str(path)}) == {"firebase": {"api_key": "abc"}}
+    assert load_config(environ={}) == {}
@@ -0,0 +1,102 @@
+from factverify.session_memory import SessionRegistry, deep_sizeof, is_evicted
+from factverify.sessions import SQLiteSessionStore
+from factverify.verify import CancelToken
+
+BIG = {"response": "x" * 100_000, "sources": [], "details": {}}
+
+
+def test_small_values_stay_in_the_session():
+    registry = SessionRegistry(max_value_bytes=1024, max_session_bytes=4096)
+    state = {"last_result": {"response": "short", "sources": [], "details": {}}}
+    registry.enforce("s1", state, evictable=("last_result",))
+    assert registry.load(state, "last_result")["response"] == "short"
+    assert not is_evicted(state["last_result"])
+
+
+def test_large_value_round_trips_through_the_store(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    registry = SessionRegistry(max_value_bytes=1024, offload=store)
+    state = {"email": "a@example.com", "last_result": dict(BIG)}
+    registry.enforce("s1", state, evictable=("last_result",))
+    assert is_evicted(state["last_result"])
+    assert deep_sizeof(state) < 1024
+    assert registry.load(state, "last_result") == BIG
+    registry.enforce("s1", state, evictable=("last_result",))
+    assert registry.load(state, "last_result") == BIG
+
+
+def test_large_value_is_dropped_without_a_store():
+    registry = SessionRegistry(max_value_bytes=1024)
+    state = {"last_result": dict(BIG)}
+    registry.enforce("s1", state, evictable=("last_result",))
+    assert is_evicted(state["last_result"])
+    assert registry.load(state, "last_result") is None
+
+
+def test_session_cap_evicts_the_largest_values_first():
+    registry = SessionRegistry(max_value_bytes=100_000, max_session_bytes=60_000)
+    state = {"a": "x" * 40_000, "b": "y" * 30_000, "c": "z" * 1_000}
+    registry.enforce("s1", state, evictable=("a", "b", "c"))
+    assert is_evicted(state["a"])
+    assert state["b"] == "y" * 30_000 and state["c"] == "z" * 1_000
+
+
+def test_reaper_trims_idle_sessions_and_forgets_closed_ones():
+    live = {
+        "s1": {"logged_in": True, "email": "a@example.com", "speculation_key": "k1",
+               "last_result": dict(BIG), "query_input": "draft"},
+    }
+    reaped = []
+    registry = SessionRegistry(idle_seconds=0, lookup=live.get,
+                               on_reap=lambda session_id, state: reaped.append(state["speculation_key"]))
+    registry.touch("s1")
+    registry.touch("closed")
+    assert registry.reap() == 1
+    assert reaped == ["k1"]
+    assert live["s1"] == {"logged_in": True, "email": "a@example.com", "speculation_key": "k1"}
+    assert registry.profile() == []
+
+
+def test_reaper_skips_sessions_with_a_running_script():
+    live = {"s1": {"logged_in": True, "last_result": dict(BIG)}, "s2": {"logged_in": True, "last_result": dict(BIG)}}
+    registry = SessionRegistry(idle_seconds=0, lookup=live.get, running=lambda session_id: session_id == "s1")
+    registry.touch("s1")
+    registry.touch("s2")
+    assert registry.reap() == 1
+    assert "last_result" in live["s1"] and "last_result" not in live["s2"]
+    assert [row["session"] for row in registry.profile()] == ["s1"]
+
+
+def test_reaper_skips_sessions_touched_since_its_scan():
+    live = {"s1": {"logged_in": True, "last_result": dict(BIG)}}
+    registry = SessionRegistry(idle_seconds=0, lookup=live.get)
+
+    def running(session_id):
+        # A run starts between the scan and the trim
+        registry.touch(session_id)
+        return False
+
+    registry.running = running
+    registry.touch("s1")
+    assert registry.reap() == 0
+    assert "last_result" in live["s1"]
+
+
+def test_recently_seen_sessions_are_kept_and_profiled():
+    live = {"s1": {"logged_in": True}, "s2": {"logged_in": True, "last_result": dict(BIG)}}
+    registry = SessionRegistry(idle_seconds=3600, lookup=live.get)
+    registry.touch("s1")
+    registry.touch("s2")
+    assert registry.reap() == 0
+    rows = registry.profile()
+    assert [row["session"] for row in rows] == ["s2", "s1"]
+    assert max(rows[0]["keys"], key=rows[0]["keys"].get) == "last_result"
+
+
+def test_finished_cancel_token_no_longer_pins_its_callbacks():
+    payload = "x" * 100_000
+    token = CancelToken()
+    token.on_cancel(lambda: len(payload))
+    assert deep_sizeof(token) > 100_000
+    token.clear()
+    assert deep_sizeof(token) < 1024
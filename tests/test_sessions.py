@@ -0,0 +1,119 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from factverify import sessions
+from factverify.sessions import (CachedSessionStore, RedisSessionStore, SQLiteSessionStore, new_session_id,
+                                 sign_session_cookie, verify_session_cookie)
+
+SECRET = "test-secret"
+
+
+def test_signed_cookie_round_trips():
+    session_id = new_session_id()
+    cookie = sign_session_cookie(session_id, 2000, SECRET)
+    assert verify_session_cookie(cookie, SECRET, now=1000) == session_id
+
+
+def test_expired_cookie_is_rejected():
+    cookie = sign_session_cookie(new_session_id(), 2000, SECRET)
+    assert verify_session_cookie(cookie, SECRET, now=2001) is None
+
+
+def test_tampered_cookie_is_rejected():
+    session_id, expires_at, signature = sign_session_cookie(new_session_id(), 2000, SECRET).split(".")
+    assert verify_session_cookie(f"{new_session_id()}.{expires_at}.{signature}", SECRET, now=1000) is None
+    assert verify_session_cookie(f"{session_id}.9999999999.{signature}", SECRET, now=1000) is None
+
+
+def test_cookie_signed_with_another_secret_is_rejected():
+    cookie = sign_session_cookie(new_session_id(), 2000, "other-secret")
+    assert verify_session_cookie(cookie, SECRET, now=1000) is None
+
+
+def test_malformed_cookies_are_rejected():
+    for value in (None, "", "no-dots", "a.b", "a.not-a-number.sig"):
+        assert verify_session_cookie(value, SECRET, now=1000) is None
+
+
+def test_sqlite_store_round_trips_and_expires(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    store.set("alive", {"email": "a@example.com"}, 60)
+    store.set("expired", {"email": "b@example.com"}, -1)
+    assert store.get("alive") == {"email": "a@example.com"}
+    assert store.get("expired") is None
+    store.delete("alive")
+    assert store.get("alive") is None
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    redis = pytest.importorskip("redis")
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, "from_url", lambda url, **kwargs: fakeredis.FakeRedis(server=server))
+    return RedisSessionStore("redis://sessions.invalid:6379/0")
+
+
+def test_redis_store_round_trips_with_a_ttl(redis_store):
+    redis_store.set("alive", {"email": "a@example.com"}, 60)
+    assert redis_store.get("alive") == {"email": "a@example.com"}
+    assert 0 < redis_store._client.ttl("factverify:session:alive") <= 60
+    assert redis_store._client.keys("*") == [b"factverify:session:alive"]
+    assert redis_store.get("missing") is None
+    redis_store.delete("alive")
+    assert redis_store.get("alive") is None
+
+
+def test_redis_store_keeps_sub_second_ttls_alive(redis_store):
+    redis_store.set("short", {"email": "a@example.com"}, 0.2)
+    assert redis_store._client.ttl("factverify:session:short") == 1
+
+
+class CountingStore:
+    def __init__(self):
+        self.data, self.gets = {}, 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+    def set(self, key, value, ttl):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(sessions, "time", SimpleNamespace(monotonic=lambda: clock.now, time=time.time))
+    return clock
+
+
+def test_cached_store_serves_repeat_reads_until_cache_ttl(clock):
+    backend = CountingStore()
+    backend.data["s1"] = {"email": "a@example.com"}
+    store = CachedSessionStore(backend, cache_ttl=5)
+    assert store.get("s1") == {"email": "a@example.com"}
+    clock.now += 4.9
+    assert store.get("s1") == {"email": "a@example.com"}
+    assert backend.gets == 1
+    backend.data["s1"] = {"email": "b@example.com"}
+    clock.now += 0.1
+    assert store.get("s1") == {"email": "b@example.com"}
+    assert backend.gets == 2
+
+
+def test_cached_store_forgets_deleted_sessions(clock):
+    backend = CountingStore()
+    store = CachedSessionStore(backend, cache_ttl=5)
+    store.set("s1", {"email": "a@example.com"}, 60)
+    assert store.get("s1") == {"email": "a@example.com"} and backend.gets == 0
+    store.delete("s1")
+    assert store.get("s1") is None and backend.gets == 1
+    # Misses are not cached, so a session created by another replica shows up at once
+    backend.data["s1"] = {"email": "b@example.com"}
+    assert store.get("s1") == {"email": "b@example.com"}
@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from factverify import metrics, speculative
+from factverify.speculative import Speculator
+
+PROMPT = "Is climate change caused by humans?"
+OTHER = "Do vaccines cause autism in children?"
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Stubbed verification; calls block until released or cancelled"""
+    calls, release = [], threading.Event()
+
+    def verify(prompt, llama_config, deadline=None, cancel_token=None, meta=None, **kwargs):
+        calls.append(prompt)
+        cancelled = threading.Event()
+        cancel_token.on_cancel(cancelled.set)
+        while not (release.is_set() or cancelled.is_set()):
+            release.wait(0.01)
+        if cancelled.is_set():
+            return None, ["Verification cancelled"]
+        return f"answer to {prompt}", []
+
+    monkeypatch.setattr(speculative, "get_verified_response", verify)
+    yield calls, release
+    release.set()
+
+
+@pytest.fixture
+def counters():
+    before = metrics.snapshot()
+    return lambda name: metrics.get(name) - before.get(name, 0)
+
+
+def started(speculator, session="s1", prompt=PROMPT):
+    speculator.schedule(session, prompt, {})
+    spec = speculator._sessions[session]
+    spec.timer.join()
+    return spec.future
+
+
+def test_claimed_draft_is_not_scheduled_again(upstream, counters):
+    calls, release = upstream
+    speculator = Speculator(debounce=0.01)
+    release.set()
+    started(speculator).result(timeout=5)
+    future, _ = speculator.claim("s1", PROMPT)
+    assert future.result()[0] == f"answer to {PROMPT}"
+    # The reruns after a submit report the same, now submitted, draft
+    speculator.schedule("s1", PROMPT, {})
+    speculator.schedule("s1", f"  {PROMPT.upper()} ", {})
+    assert calls == [PROMPT]
+    assert counters("speculative_started") == 1
+    assert counters("speculative_hits") == 1
+    assert counters("speculative_unclaimed") == 0
+
+
+def test_claim_attaches_to_a_call_still_running(upstream, counters):
+    calls, release = upstream
+    speculator = Speculator(debounce=0.01)
+    started(speculator)
+    future, token = speculator.claim("s1", PROMPT)
+    speculator.schedule("s1", OTHER, {})
+    release.set()
+    assert future.result(timeout=5)[0] == f"answer to {PROMPT}"
+    assert not token.cancelled
+    assert counters("speculative_attached") == 1
+    assert counters("speculative_unclaimed") == 0
+
+
+def test_changed_draft_cancels_and_counts_unclaimed(upstream, counters):
+    speculator = Speculator(debounce=0.01)
+    first = started(speculator)
+    started(speculator, prompt=OTHER)
+    assert first.result(timeout=5)[0] is None
+    assert counters("speculative_cancelled") == 1
+    assert counters("speculative_unclaimed") == 1
+
+
+def test_submit_before_debounce_runs_in_the_foreground(upstream, counters):
+    calls, _ = upstream
+    speculator = Speculator(debounce=60)
+    speculator.schedule("s1", PROMPT, {})
+    assert speculator.claim("s1", PROMPT) is None
+    speculator.schedule("s1", PROMPT, {})
+    assert calls == []
+    assert counters("speculative_started") == 0
+
+
+def test_start_budget_is_shared_across_sessions(upstream, counters):
+    _, release = upstream
+    speculator = Speculator(debounce=0.01, max_per_minute=1)
+    release.set()
+    assert started(speculator, "s1") is not None
+    assert started(speculator, "s2", OTHER) is None
+    assert counters("speculative_skipped_budget") == 1
+
+
+def test_short_drafts_are_ignored(upstream):
+    speculator = Speculator(debounce=0.01)
+    speculator.schedule("s1", "too short", {})
+    assert "s1" not in speculator._sessions
@@ -0,0 +1,118 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from factverify import upstreams
+from factverify.upstreams import HealthMonitor, probe, start_health_monitor, upstream_origins
+
+
+class Upstream(BaseHTTPRequestHandler):
+    status = 200
+
+    def do_HEAD(self):
+        self.send_response(type(self).status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    handler = type("Handler", (Upstream,), {"status": 200})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield handler, f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize("status, healthy", [
+    (200, True), (404, True), (405, True), (501, True),
+    (500, False), (502, False), (503, False), (504, False),
+])
+def test_probe_health_by_status(upstream, status, healthy):
+    handler, origin = upstream
+    handler.status = status
+    result = probe(origin)
+    assert result["healthy"] is healthy
+    assert result["status_code"] == status
+    assert result["latency_ms"] >= result["dns_ms"] >= 0
+
+
+def test_probe_reports_connection_errors():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    port = server.server_port
+    server.server_close()
+    result = probe(f"http://127.0.0.1:{port}/", timeout=1)
+    assert result["healthy"] is False and "error" in result
+
+
+def test_ready_needs_every_upstream_probed_and_healthy(upstream):
+    handler, origin = upstream
+    monitor = HealthMonitor({"firebase": origin, "llama": origin})
+    assert not monitor.ready()
+    handler.status = 503
+    monitor.probe_all()
+    assert not monitor.ready()
+    handler.status = 200
+    status = monitor.probe_all()
+    assert monitor.ready()
+    assert set(status) == {"firebase", "llama"}
+
+
+def test_ready_endpoint_turns_200_once_upstreams_recover(upstream):
+    handler, origin = upstream
+    handler.status = 503
+    monitor = HealthMonitor({"llama": origin})
+    port = monitor.serve(0, host="127.0.0.1")
+    try:
+        code, body = get(f"http://127.0.0.1:{port}/ready")
+        assert code == 503 and body["ready"] is False
+        monitor.probe_all()
+        assert get(f"http://127.0.0.1:{port}/ready")[0] == 503
+        code, body = get(f"http://127.0.0.1:{port}/health")
+        assert code == 200 and body["upstreams"]["llama"]["status_code"] == 503
+        handler.status = 200
+        monitor.probe_all()
+        code, body = get(f"http://127.0.0.1:{port}/ready")
+        assert code == 200 and body["ready"] is True
+    finally:
+        monitor.stop()
+
+
+def test_start_health_monitor_is_a_process_wide_singleton(upstream, monkeypatch):
+    _, origin = upstream
+    monkeypatch.setattr(upstreams, "_monitor", None)
+    monitor = start_health_monitor({"llama": {"api_url": origin + "v1/chat/completions"}}, interval=60)
+    try:
+        assert start_health_monitor({}, interval=1) is monitor
+        assert monitor.origins == {"llama": origin}
+        for _ in range(50):
+            if monitor.ready():
+                break
+            monitor._stop.wait(0.05)
+        assert monitor.ready()
+    finally:
+        monitor.stop()
+
+
+def test_upstream_origins_reduce_urls_to_scheme_and_host():
+    origins = upstream_origins({"firebase": {"api_key": "k"},
+                                "llama": {"api_url": "https://api.groq.com/openai/v1/chat/completions"}})
+    assert origins == {"firebase": "https://identitytoolkit.googleapis.com/", "llama": "https://api.groq.com/"}
+    assert upstream_origins({}) == {}
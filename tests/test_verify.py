@@ -0,0 +1,287 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from factverify import metrics, verify
+from factverify.breaker import CircuitBreaker, breakers
+from factverify.cache import response_cache
+
+CONFIG = {"api_key": "key", "api_url": "https://llm.invalid/v1/chat/completions"}
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body if isinstance(self.body, dict) else json.loads(self.body)
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.body.splitlines())
+
+    def close(self):
+        pass
+
+
+def sse(text):
+    chunk = {"choices": [{"delta": {"content": text}}]}
+    return f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n"
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Queue of responses for session.post; the payloads sent are recorded"""
+    responses, payloads = [], []
+
+    def post(url, json=None, **kwargs):
+        payloads.append(json)
+        return responses.pop(0)
+
+    monkeypatch.setattr(verify.session, "post", post)
+    monkeypatch.setattr(verify, "_structured_supported", True)
+    response_cache.clear()
+    yield responses, payloads
+    response_cache.clear()
+
+
+def test_structured_answer_is_requested_without_streaming(upstream):
+    responses, payloads = upstream
+    answer = {"answer": "Yes.", "verdict": "true", "confidence": 0.9, "sources": []}
+    responses.append(FakeResponse(200, {
+        "choices": [{"message": {"content": json.dumps(answer)}}],
+        "usage": {"completion_tokens": 12},
+    }))
+    meta = {}
+    assert verify.get_verified_response("claim", CONFIG, structured=True, meta=meta) == ("Yes.", [])
+    assert payloads[0]["stream"] is False
+    assert payloads[0]["response_format"] == {"type": "json_object"}
+    assert meta["mode"] == "structured" and meta["completion_tokens"] == 12
+
+
+def test_failed_json_generation_falls_back_once(upstream):
+    responses, payloads = upstream
+    misses = metrics.get("cache_misses")
+    responses.append(FakeResponse(400, {"error": {
+        "message": "Failed to generate JSON. Please adjust your prompt.",
+        "code": "json_validate_failed",
+    }}))
+    responses.append(FakeResponse(200, sse("Free-form answer")))
+    assert verify.get_verified_response("claim", CONFIG, structured=True) == ("Free-form answer", [])
+    assert "response_format" not in payloads[1]
+    assert verify._structured_supported
+    assert metrics.get("cache_misses") == misses + 1
+    assert response_cache.get("claim")[0][0] == "Free-form answer"
+
+
+def test_unsupported_json_mode_is_remembered(upstream):
+    responses, _ = upstream
+    responses.append(FakeResponse(400, {"error": {
+        "message": "response_format is not supported with this model",
+        "param": "response_format",
+    }}))
+    responses.append(FakeResponse(200, sse("Free-form answer")))
+    assert verify.get_verified_response("claim", CONFIG, structured=True, use_cache=False)[0] == "Free-form answer"
+    assert not verify._structured_supported
+
+
+def structured_body(answer="Yes.", verdict="true"):
+    content = {"answer": answer, "verdict": verdict, "confidence": 0.9, "sources": []}
+    return {"choices": [{"message": {"content": json.dumps(content)}}], "usage": {"completion_tokens": 12}}
+
+
+def test_structured_caller_is_not_served_a_free_form_answer(upstream):
+    responses, payloads = upstream
+    responses.append(FakeResponse(200, sse("Free-form answer")))
+    assert verify.get_verified_response("claim", CONFIG, structured=False)[0] == "Free-form answer"
+    responses.append(FakeResponse(200, structured_body()))
+    meta = {}
+    assert verify.get_verified_response("claim", CONFIG, structured=True, meta=meta)[0] == "Yes."
+    assert len(payloads) == 2 and meta["verdict"] == "true"
+    meta = {}
+    assert verify.get_verified_response("claim", CONFIG, structured=True, meta=meta)[0] == "Yes."
+    assert len(payloads) == 2 and meta["verdict"] == "true" and meta["cached"]
+    assert verify.get_verified_response("claim", CONFIG, structured=False)[0] == "Yes."
+    assert len(payloads) == 2
+
+
+def test_structured_fallback_answer_is_not_cached_for_structured_callers(upstream):
+    responses, payloads = upstream
+    responses.append(FakeResponse(400, {"error": {"message": "Failed to generate JSON.",
+                                                  "code": "json_validate_failed"}}))
+    responses.append(FakeResponse(200, sse("Free-form answer")))
+    verify.get_verified_response("claim", CONFIG, structured=True)
+    responses.append(FakeResponse(200, structured_body()))
+    meta = {}
+    assert verify.get_verified_response("claim", CONFIG, structured=True, meta=meta)[0] == "Yes."
+    assert len(payloads) == 3 and meta["mode"] == "structured" and "cached" not in meta
+
+
+def test_structured_generation_time_is_not_a_slow_call(upstream, monkeypatch):
+    breaker = CircuitBreaker("llama", "Verification service", slow_call_seconds=0)
+    monkeypatch.setitem(breakers, "llama", breaker)
+    responses, _ = upstream
+    for _ in range(4):
+        responses.append(FakeResponse(200, structured_body()))
+        assert verify.get_verified_response("claim", CONFIG, structured=True, use_cache=False)[0] == "Yes."
+    assert breaker.status() == {"state": "closed", "recent_calls": 4, "recent_failures": 0}
+
+
+class Interrupted(BaseException):
+    """Stands in for Streamlit's StopException raised at an st.* checkpoint"""
+
+
+class BlockingResponse(FakeResponse):
+    """A non-streamed body that only arrives once the connection is closed"""
+    def __init__(self):
+        super().__init__(200, structured_body())
+        self.closed = threading.Event()
+
+    def json(self):
+        self.closed.wait(5)
+        raise ConnectionError("connection closed")
+
+    def close(self):
+        self.closed.set()
+
+
+def test_structured_read_stays_interruptible(upstream):
+    responses, _ = upstream
+    blocking = BlockingResponse()
+    responses.append(blocking)
+    calls = []
+
+    def on_progress(count):
+        calls.append(count)
+        if len(calls) == 2:
+            raise Interrupted()
+
+    cancelled = metrics.get("verify_cancelled")
+    started = time.monotonic()
+    with pytest.raises(Interrupted):
+        verify.get_verified_response("claim", CONFIG, structured=True, on_progress=on_progress, use_cache=False)
+    assert time.monotonic() - started < 1
+    assert calls == [0, 0] and blocking.closed.is_set()
+    assert metrics.get("verify_cancelled") == cancelled + 1
+
+
+class StallingUpstream(BaseHTTPRequestHandler):
+    """Streams one chunk after `first_chunk_after` seconds, then stalls until the client leaves"""
+    protocol_version = "HTTP/1.1"
+    first_chunk_after = 0.2
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.first_chunk_after)
+        chunk = {"choices": [{"delta": {"content": "partial"}}]}
+        data = f"data: {json.dumps(chunk)}\n\n".encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+        try:
+            while self.rfile.read(1):
+                pass
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stalling_upstream(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StallingUpstream)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setitem(breakers, "llama", CircuitBreaker("llama", "Verification service", slow_call_seconds=20))
+    response_cache.clear()
+    yield {"api_key": "key", "api_url": f"http://127.0.0.1:{server.server_port}/v1/chat/completions"}
+    server.shutdown()
+    server.server_close()
+
+
+def test_deadline_aborts_a_stalled_stream(stalling_upstream, monkeypatch):
+    # A chunk just before the deadline restarts the socket's read timeout
+    monkeypatch.setattr(StallingUpstream, "first_chunk_after", 0.8)
+    exceeded = metrics.get("verify_deadline_exceeded")
+    started = time.monotonic()
+    response, errors = verify.get_verified_response("claim", stalling_upstream, deadline=verify.Deadline(1),
+                                                    structured=False)
+    assert time.monotonic() - started < 1.4
+    assert response is None
+    assert errors == ["Verification cancelled: deadline exceeded"]
+    assert metrics.get("verify_deadline_exceeded") == exceeded + 1
+
+
+def test_cancel_from_another_thread_aborts_the_read(stalling_upstream):
+    cancelled = metrics.get("verify_cancelled")
+    chunks = metrics.get("cancelled_chunks_received")
+    token = verify.CancelToken()
+    threading.Timer(0.5, token.cancel, ("logout",)).start()
+    started = time.monotonic()
+    response, errors = verify.get_verified_response("claim", stalling_upstream, cancel_token=token, structured=False)
+    assert time.monotonic() - started < 1.5
+    assert errors == ["Verification cancelled: logout"]
+    assert metrics.get("verify_cancelled") == cancelled + 1
+    assert metrics.get("cancelled_chunks_received") == chunks + 1
+
+
+def test_cancelled_token_skips_the_call(upstream):
+    responses, payloads = upstream
+    token = verify.CancelToken()
+    token.cancel("superseded")
+    assert verify.get_verified_response("claim", CONFIG, cancel_token=token, use_cache=False) == (
+        None, ["Verification cancelled: superseded"])
+    assert payloads == []
+
+
+def test_expired_deadline_skips_the_call(upstream):
+    responses, payloads = upstream
+    assert verify.get_verified_response("claim", CONFIG, deadline=verify.Deadline(0), use_cache=False) == (
+        None, ["Verification cancelled: deadline exceeded"])
+    assert payloads == []
+
+
+def test_deadline_counts_down():
+    deadline = verify.Deadline(60)
+    assert 59 < deadline.remaining() <= 60 and not deadline.expired
+    assert verify.Deadline(-1).remaining() == 0 and verify.Deadline(-1).expired
+
+
+def test_cancel_token_runs_callbacks_once():
+    token, calls = verify.CancelToken(), []
+    token.on_cancel(lambda: calls.append("first"))
+    token.on_cancel(lambda: 1 / 0)
+    token.cancel("logout")
+    token.cancel("again")
+    assert calls == ["first"] and token.reason == "logout" and token.cancelled
+    token.on_cancel(lambda: calls.append("late"))
+    assert calls == ["first", "late"]
+
+
+def test_cleared_callbacks_do_not_run():
+    token, calls = verify.CancelToken(), []
+    token.on_cancel(lambda: calls.append("abort"))
+    token.clear()
+    token.cancel()
+    assert calls == []
+
+
+def test_abort_shuts_down_the_socket():
+    left, right = socket.socketpair()
+    closed = []
+    response = SimpleNamespace(raw=SimpleNamespace(_connection=SimpleNamespace(sock=left)),
+                               close=lambda: closed.append(True))
+    verify._abort(response)
+    assert right.recv(1) == b""
+    assert closed == [True]
+    left.close()
+    right.close()